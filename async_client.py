@@ -0,0 +1,284 @@
+"""
+asyncio client engine for the a4 / RPS protocol.
+
+Speaks the same handshake, framing and request packing as protocol.py, but over
+asyncio streams so one event loop can drive thousands of sessions. Moves come
+from a coroutine, choose_move(game_data), instead of input().
+"""
+
+import asyncio
+import time
+from game_data import GameData_a4, GameData_rps
+from errors import GameActionError, error_for_status
+from codec import HEADER, Message, pack_handshake, pack_turn
+from protocol import DEFAULT_PORT
+from constants import END_OF_GAME, ENDIANNESS, ID_X, MOVE_MADE, RPS, SUCCESS, TTT, UPDATE, WIN
+
+
+class SessionTimings:
+    """
+    Latencies recorded by one session, in seconds.
+    """
+    __slots__ = ('connect', 'moves')
+
+    def __init__(self):
+        self.connect = None
+        self.moves = []
+
+
+async def close_writer(writer: asyncio.StreamWriter):
+    """
+    Closes a connection and waits until its transport is gone, so no session leaves it closing
+    after the event loop has stopped.
+
+    :param writer: asyncio.StreamWriter
+    :return: void
+    """
+    writer.close()
+
+    try:
+        await writer.wait_closed()
+    except ConnectionError:
+        # Already reset by the peer; it is closed either way
+        pass
+
+
+async def get_message(reader: asyncio.StreamReader) -> Message:
+    """
+    Gets a message from the server.
+
+    :param reader: asyncio.StreamReader
+    :return: Message the header fields and payload bytes
+    """
+    msg_type, context, payload_length = await reader.readexactly(HEADER.size)
+
+    if payload_length != 0:
+        payload = await reader.readexactly(payload_length)
+    else:
+        payload = b''
+
+    return Message(msg_type, context, payload)
+
+
+async def handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, game_id: int) -> int:
+    """
+    Sends the handshake and waits for the assigned uid.
+
+    :param reader: asyncio.StreamReader
+    :param writer: asyncio.StreamWriter
+    :param game_id: int
+    :return: int uid of player
+    """
+    writer.write(pack_handshake(game_id))
+    await writer.drain()
+
+    msg_type, msg_context, payload_length = await reader.readexactly(HEADER.size)
+    uid = int.from_bytes(await reader.readexactly(payload_length), ENDIANNESS)
+
+    if msg_type != SUCCESS:
+        raise error_for_status(msg_type)
+
+    return uid
+
+
+async def take_turn(game_data: GameData_a4, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    choose_move, timings: SessionTimings = None):
+    """
+    Asks choose_move for a play, sends it and waits for the server's response.
+
+    :param game_data: GameData_a4
+    :param reader: asyncio.StreamReader
+    :param writer: asyncio.StreamWriter
+    :param choose_move: coroutine function taking game_data and returning a play or 'Q'
+    :param timings: SessionTimings to record the round trip in, if any
+    :return: the accepted play, or None if the play was illegal and another is needed
+    :raises StatusError: if the server rejects the request for anything other than an illegal play
+    """
+    proposed_play = await choose_move(game_data)
+
+    sent_at = time.perf_counter()
+    writer.write(pack_turn(game_data.get_uid(), proposed_play))
+    await writer.drain()
+
+    play_response = await get_message(reader)
+
+    if timings is not None:
+        timings.moves.append(time.perf_counter() - sent_at)
+
+    return _apply_response(game_data, proposed_play, play_response.msg_type)
+
+
+def _apply_response(game_data: GameData_a4, proposed_play, response_status: int):
+    """
+    Applies the server's response to a play.
+
+    :return: the play if it was accepted, None if it was illegal and another is needed
+    :raises StatusError: for any other error status
+    """
+    if response_status != SUCCESS:
+        error = error_for_status(response_status)
+
+        if not isinstance(error, GameActionError):
+            raise error
+
+        return None
+
+    if proposed_play != 'Q' and not isinstance(game_data, GameData_rps):
+        game_data.update_board(proposed_play, game_data.get_identity())
+
+    return proposed_play
+
+
+async def play_ttt(host: str, port: int, choose_move, game_data: GameData_a4 = None,
+                   timings: SessionTimings = None):
+    """
+    Plays one tic-tac-toe game.
+
+    :param host: str
+    :param port: int
+    :param choose_move: coroutine function taking game_data and returning a position or 'Q'
+    :param game_data: GameData_a4 to track the game in, a fresh one if None
+    :param timings: SessionTimings to record connection setup and move latencies in, if any
+    :return: int the OUTCOMES value, or None if this player quit
+    :raises StatusError: if the server reports an error other than an illegal play
+    """
+    if game_data is None:
+        game_data = GameData_a4()
+
+    connect_started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        game_data.set_uid(await handshake(reader, writer, TTT))
+
+        if timings is not None:
+            timings.connect = time.perf_counter() - connect_started
+
+        message = await get_message(reader)
+
+        if message.msg_type == UPDATE:
+            game_data.set_identity(message.payload[0])
+
+        if game_data.get_identity() == ID_X:
+            if not await _take_turn_until_accepted(game_data, reader, writer, choose_move, timings):
+                return None
+
+        while True:
+            server_message = await get_message(reader)
+
+            msg_type = server_message.msg_type
+            msg_context = server_message.context
+
+            if msg_type != UPDATE:
+                continue
+
+            if msg_context == MOVE_MADE:
+                game_data.update_board(server_message.payload[0], game_data.get_adversary())
+
+                if not await _take_turn_until_accepted(game_data, reader, writer, choose_move, timings):
+                    return None
+            elif msg_context == END_OF_GAME:
+                outcome = server_message.payload[0]
+
+                # On a tie the last play may have been this player's own
+                if outcome != WIN and game_data.check_if_spot_is_played(server_message.payload[1]):
+                    game_data.update_board(server_message.payload[1], game_data.get_adversary())
+
+                return outcome
+    finally:
+        await close_writer(writer)
+
+
+async def play_rps(host: str, port: int, choose_move, game_data: GameData_rps = None,
+                   timings: SessionTimings = None):
+    """
+    Plays one rock-paper-scissors game.
+
+    :param host: str
+    :param port: int
+    :param choose_move: coroutine function taking game_data and returning an RPS_PLAYS value or 'Q'
+    :param game_data: GameData_rps to track the game in, a fresh one if None
+    :param timings: SessionTimings to record connection setup and move latencies in, if any
+    :return: tuple of (OUTCOMES value, adversary's RPS_PLAYS value), or None if this player quit
+    :raises StatusError: if the server reports an error other than an illegal play
+    """
+    if game_data is None:
+        game_data = GameData_rps()
+
+    connect_started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        game_data.set_uid(await handshake(reader, writer, RPS))
+
+        if timings is not None:
+            timings.connect = time.perf_counter() - connect_started
+
+        await get_message(reader)
+
+        if not await _take_turn_until_accepted(game_data, reader, writer, choose_move, timings):
+            return None
+
+        while True:
+            server_message = await get_message(reader)
+
+            msg_type = server_message.msg_type
+            msg_context = server_message.context
+
+            if msg_type == UPDATE and msg_context == END_OF_GAME:
+                return server_message.payload[0], server_message.payload[1]
+    finally:
+        await close_writer(writer)
+
+
+async def _take_turn_until_accepted(game_data, reader, writer, choose_move, timings) -> bool:
+    """
+    Retries take_turn until the server accepts a play.
+
+    :return: bool False if the accepted play was a quit
+    """
+    accepted_play = None
+
+    while accepted_play is None:
+        accepted_play = await take_turn(game_data, reader, writer, choose_move, timings)
+
+    return accepted_play != 'Q'
+
+
+async def run_sessions(session_factory, count: int, concurrency: int = None) -> list:
+    """
+    Runs count sessions on the current event loop.
+
+    :param session_factory: callable taking the session index and returning a coroutine
+    :param count: int number of sessions
+    :param concurrency: int maximum sessions in flight, unlimited if None
+    :return: list of each session's result or raised exception, in index order
+    """
+    if concurrency is None:
+        return await asyncio.gather(*(session_factory(i) for i in range(count)), return_exceptions=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int):
+        async with semaphore:
+            return await session_factory(index)
+
+    return await asyncio.gather(*(limited(i) for i in range(count)), return_exceptions=True)
+
+
+def run(host: str, count: int, choose_move, game_id: int = TTT, port: int = DEFAULT_PORT,
+        concurrency: int = None) -> list:
+    """
+    Plays count concurrent games from one event loop.
+
+    :param host: str
+    :param count: int
+    :param choose_move: coroutine function taking game_data and returning a play or 'Q'
+    :param game_id: int GAMES value
+    :param port: int
+    :param concurrency: int maximum sessions in flight, unlimited if None
+    :return: list of each session's result or raised exception
+    """
+    play = play_ttt if game_id == TTT else play_rps
+
+    return asyncio.run(run_sessions(lambda i: play(host, port, choose_move), count, concurrency))
@@ -0,0 +1,110 @@
+"""
+Vectorized evaluation of many tic-tac-toe boards at once. Requires NumPy.
+
+Boards are stacked into an (n, 9) uint8 array of the ASCII ordinals GameData uses
+(45 empty, 88 X, 79 O). Every function works on the whole stack with NumPy operations:
+each board becomes a pair of 9-bit masks, and winners and best moves are table lookups on
+those masks, as in bitboard.py and engine_table.py.
+"""
+
+import numpy
+from bitboard import BOARD_SIZE, EMPTY, FULL_MASK, WINNING_MASKS, X, O
+from engine_table import build_entries
+
+_BITS = (1 << numpy.arange(BOARD_SIZE)).astype(numpy.uint16)
+_TERNARY = (3 ** numpy.arange(BOARD_SIZE)).astype(numpy.int32)
+_WINNING = numpy.array(WINNING_MASKS, dtype=bool)
+
+_entries = None
+
+
+def stack(boards) -> numpy.ndarray:
+    """
+    Stacks boards into one array.
+
+    :param boards: sequence of bytes-like boards (GameData's default bytearray board, bytes), or
+                   of BitBoards or lists of ordinals, or an existing (n, 9) array
+    :return: numpy.ndarray (n, 9) uint8
+    """
+    if isinstance(boards, numpy.ndarray):
+        return boards.astype(numpy.uint8, copy=False).reshape(-1, BOARD_SIZE)
+
+    try:
+        # One bulk copy per board when they expose a buffer
+        joined = b"".join(boards)
+    except TypeError:
+        joined = b"".join(bytes(board) for board in boards)
+
+    return numpy.frombuffer(joined, dtype=numpy.uint8).reshape(-1, BOARD_SIZE)
+
+
+def masks(boards: numpy.ndarray) -> tuple:
+    """
+    :param boards: numpy.ndarray (n, 9) from stack
+    :return: tuple of (x masks, o masks), numpy.ndarray (n,) uint16 each
+    """
+    return (boards == X) @ _BITS, (boards == O) @ _BITS
+
+
+def winners(boards: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param boards: numpy.ndarray (n, 9) from stack
+    :return: numpy.ndarray (n,) uint8 of X or O for the winner, EMPTY where nobody has won
+    """
+    x_masks, o_masks = masks(boards)
+
+    return numpy.where(_WINNING[x_masks], X, numpy.where(_WINNING[o_masks], O, EMPTY)).astype(numpy.uint8)
+
+
+def draws(boards: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param boards: numpy.ndarray (n, 9) from stack
+    :return: numpy.ndarray (n,) bool, True where the board is full with no winner
+    """
+    x_masks, o_masks = masks(boards)
+
+    return ((x_masks | o_masks) == FULL_MASK) & ~_WINNING[x_masks] & ~_WINNING[o_masks]
+
+
+def legal_moves(boards: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param boards: numpy.ndarray (n, 9) from stack
+    :return: numpy.ndarray (n, 9) bool, True for each open cell of a board that is still in play
+    """
+    x_masks, o_masks = masks(boards)
+    in_play = ~(_WINNING[x_masks] | _WINNING[o_masks])
+
+    return (boards == EMPTY) & in_play[:, None]
+
+
+def indexes(boards: numpy.ndarray) -> numpy.ndarray:
+    """
+    Gets each board's engine_table.board_index.
+
+    :param boards: numpy.ndarray (n, 9) from stack
+    :return: numpy.ndarray (n,) int32
+    """
+    return (boards == X) @ _TERNARY + 2 * ((boards == O) @ _TERNARY)
+
+
+def best_moves(boards: numpy.ndarray, engine=None) -> numpy.ndarray:
+    """
+    Gets the engine's best move for every board.
+
+    :param boards: numpy.ndarray (n, 9) from stack
+    :param engine: engine_table.MappedEngine to read the moves from; if None they are solved
+                   once per process with the shared engine
+    :return: numpy.ndarray (n,) uint8 of positions, engine_table.NO_MOVE for finished and
+             unreachable boards
+    """
+    global _entries
+
+    if engine is not None:
+        entries = numpy.frombuffer(engine.get_entries(), dtype=numpy.uint8)
+    else:
+        if _entries is None:
+            _entries = numpy.frombuffer(bytes(build_entries()), dtype=numpy.uint8)
+
+        entries = _entries
+
+    return entries[indexes(boards)]
@@ -0,0 +1,319 @@
+"""
+Benchmarks for the client's hot paths.
+
+Every benchmark reports a rate where higher is better. Results are printed as JSON and can be
+written to a file, saved as a baseline, or compared against one.
+
+usage:
+    python3 benchmarks.py [--only name ...] [--output FILE] [--save-baseline FILE]
+                          [--baseline FILE] [--tolerance t] [--import-budget SECONDS]
+
+With --baseline, exits with status 1 if any benchmark falls more than the tolerance below its
+baseline rate. With --import-budget, also exits with status 1 if importing either client takes
+longer than the budget or loads a module that is meant to be loaded on demand.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from async_client import play_ttt, run_sessions
+from codec import HEADER, pack_turn
+from dispatch import A4_CODES, UPDATE_CODE, GameState, Protocol, decode_a4
+from game_data import GameData, GameData_a4
+from protocol import get_header, get_message, get_payload
+from reference_server import ReferenceServer
+from constants import ID_O, ID_X, MOVE_MADE, UPDATE
+
+REPEATS = 3
+DEFAULT_TOLERANCE = 0.10
+
+CLIENT_MODULES = ("ttt_client", "rps_client")
+
+# Loaded on demand, so importing a client must leave them out
+DEFERRED_MODULES = ("argparse", "json", "legacy", "metadata", "queue", "random", "signal", "threading")
+
+# One MOVE_MADE update, the most common frame a client reads
+MOVE_MADE_FRAME = HEADER.pack(UPDATE, MOVE_MADE, 1) + bytes((4,))
+
+# X wins along the top row while O plays the middle row
+SCRIPTED_MOVES = {
+    ID_X: ('0', '1', '2'),
+    ID_O: ('3', '4', '5'),
+}
+
+
+def best_rate(run, operations: int) -> float:
+    """
+    Runs a benchmark REPEATS times and keeps the fastest.
+
+    :param run: callable that performs operations operations
+    :param operations: int
+    :return: float operations per second
+    """
+    best = None
+
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return operations / best
+
+
+def _socketpair_reader(frames: int, read_frame) -> float:
+    """
+    Times reading frames from a socketpair while a thread writes them.
+    """
+    payload = MOVE_MADE_FRAME * frames
+
+    def run():
+        client, server = socket.socketpair()
+
+        writer = threading.Thread(target=server.sendall, args=(payload,))
+        writer.start()
+
+        try:
+            for _ in range(frames):
+                read_frame(client)
+        finally:
+            writer.join()
+            client.close()
+            server.close()
+
+    return best_rate(run, frames)
+
+
+def bench_get_message(frames: int = 100000) -> float:
+    return _socketpair_reader(frames, get_message)
+
+
+def bench_get_header_payload(frames: int = 100000) -> float:
+    def read_frame(s):
+        get_payload(s, get_header(s))
+
+    return _socketpair_reader(frames, read_frame)
+
+
+def bench_dispatch(frames: int = 100000) -> float:
+    protocol = Protocol(GameData_a4, decode_a4, A4_CODES, {
+        UPDATE_CODE + MOVE_MADE: lambda state, message: None,
+    })
+    state = GameState(None, None)
+
+    def read_frame(s):
+        state.s = s
+        protocol.handle_next(state)
+
+    return _socketpair_reader(frames, read_frame)
+
+
+def bench_pack_turn(operations: int = 200000) -> float:
+    def run():
+        for i in range(operations):
+            pack_turn(12345, '4')
+
+    return best_rate(run, operations)
+
+
+def bench_print_board(operations: int = 20000) -> float:
+    game_data = GameData()
+
+    for position, identity in ((0, 88), (4, 79), (8, 88)):
+        game_data.set_play(position, identity)
+
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for _ in range(operations):
+                game_data.print_board()
+
+    return best_rate(run, operations)
+
+
+def import_time(module: str) -> tuple:
+    """
+    Imports a module in a fresh interpreter.
+
+    :param module: str
+    :return: tuple of (float seconds the import took, set of the modules loaded afterwards)
+    """
+    code = "import sys, %s; print(' '.join(sys.modules))" % module
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                               check=True)
+
+    # Lines read "import time: self | cumulative | name", in microseconds
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000000, set(completed.stdout.split())
+
+    raise RuntimeError("no import time reported for " + module)
+
+
+def _bench_import(module: str) -> float:
+    return 1 / min(import_time(module)[0] for _ in range(REPEATS))
+
+
+def bench_import_ttt_client() -> float:
+    return _bench_import("ttt_client")
+
+
+def bench_import_rps_client() -> float:
+    return _bench_import("rps_client")
+
+
+def check_imports(budget: float) -> list:
+    """
+    Checks each client's startup cost.
+
+    :param budget: float seconds importing a client may take, fastest of REPEATS
+    :return: list of str problems, empty if every client is within budget
+    """
+    problems = []
+
+    for module in CLIENT_MODULES:
+        timings = [import_time(module) for _ in range(REPEATS)]
+        seconds = min(elapsed for elapsed, _ in timings)
+        loaded = timings[0][1].intersection(DEFERRED_MODULES)
+
+        if seconds > budget:
+            problems.append("%s takes %.1f ms to import, over the %.1f ms budget"
+                            % (module, seconds * 1000, budget * 1000))
+
+        if loaded:
+            problems.append("%s loads %s at import" % (module, ", ".join(sorted(loaded))))
+
+    return problems
+
+
+async def scripted_move(game_data) -> str:
+    played = sum(1 for cell in game_data.get_game_board() if cell == game_data.get_identity())
+
+    return SCRIPTED_MOVES[game_data.get_identity()][played]
+
+
+def bench_games(games: int = 2000) -> float:
+    """
+    Complete games per second against an in-process reference server over loopback.
+    """
+    async def play_all():
+        server = ReferenceServer()
+        await server.start('127.0.0.1', 0)
+        port = server.get_port()
+
+        try:
+            results = await run_sessions(lambda i: play_ttt('127.0.0.1', port, scripted_move), 2 * games, 256)
+        finally:
+            server.close()
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+
+        if errors:
+            raise errors[0]
+
+    return best_rate(lambda: asyncio.run(play_all()), games)
+
+
+BENCHMARKS = {
+    "get_message": bench_get_message,
+    "get_header_payload": bench_get_header_payload,
+    "dispatch": bench_dispatch,
+    "pack_turn": bench_pack_turn,
+    "print_board": bench_print_board,
+    "games": bench_games,
+    "import_ttt_client": bench_import_ttt_client,
+    "import_rps_client": bench_import_rps_client,
+}
+
+
+def run_benchmarks(names: list = None) -> dict:
+    """
+    Runs benchmarks.
+
+    :param names: list of BENCHMARKS keys, all of them if None
+    :return: dict of name to operations per second
+    """
+    return {name: BENCHMARKS[name]() for name in (names or BENCHMARKS)}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Finds benchmarks that fell below their baseline.
+
+    :param results: dict from run_benchmarks
+    :param baseline: dict from a previous run
+    :param tolerance: float fraction a rate may drop before it counts as a regression
+    :return: list of (name, rate, baseline rate)
+    """
+    regressions = []
+
+    for name, rate in results.items():
+        expected = baseline.get(name)
+
+        if expected is not None and rate < expected * (1 - tolerance):
+            regressions.append((name, rate, expected))
+
+    return regressions
+
+
+def create_arguments() -> argparse:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run. Default = all")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--save-baseline", metavar="FILE", help="write the results as the new baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed drop below the baseline. Default = " + str(DEFAULT_TOLERANCE))
+    parser.add_argument("--import-budget", type=float, metavar="SECONDS",
+                        help="fail if importing a client takes longer or loads a module meant for later")
+
+    return parser
+
+
+def main():
+    args = create_arguments().parse_args()
+
+    results = run_benchmarks(args.only)
+    report = json.dumps(results, indent=2, sort_keys=True)
+    print(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as results_file:
+                results_file.write(report + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, args.tolerance)
+
+        for name, rate, expected in regressions:
+            print("REGRESSION %s: %.1f/s vs baseline %.1f/s" % (name, rate, expected), file=sys.stderr)
+
+        if regressions:
+            exit(1)
+
+    if args.import_budget:
+        problems = check_imports(args.import_budget)
+
+        for problem in problems:
+            print("STARTUP " + problem, file=sys.stderr)
+
+        if problems:
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
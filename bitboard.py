@@ -0,0 +1,139 @@
+"""
+Compact tic-tac-toe board: one 9-bit mask per player.
+
+Behaves like the list of ASCII ordinals GameData uses by default (indexing, assignment and
+iteration all use 45/88/79), so it can be dropped in as GameData's board backend.
+"""
+
+EMPTY = 45
+X = 88
+O = 79
+
+BOARD_SIZE = 9
+FULL_MASK = (1 << BOARD_SIZE) - 1
+
+LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8),
+         (0, 3, 6), (1, 4, 7), (2, 5, 8),
+         (0, 4, 8), (2, 4, 6))
+
+LINE_MASKS = tuple((1 << a) | (1 << b) | (1 << c) for a, b, c in LINES)
+
+# WINNING_MASKS[mask] is True if mask contains a complete line
+WINNING_MASKS = tuple(any(mask & line == line for line in LINE_MASKS) for mask in range(FULL_MASK + 1))
+
+# SYMMETRIES[s][i] is the position cell i moves to under symmetry s
+SYMMETRIES = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),  # identity
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),  # rotate 90
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),  # rotate 180
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),  # rotate 270
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),  # mirror left-right
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),  # mirror top-bottom
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),  # main diagonal
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),  # anti-diagonal
+)
+
+INVERSE_SYMMETRIES = tuple(tuple(symmetry.index(i) for i in range(BOARD_SIZE)) for symmetry in SYMMETRIES)
+
+
+class BitBoard:
+    __slots__ = ('x_mask', 'o_mask')
+
+    def __init__(self, x_mask: int = 0, o_mask: int = 0):
+        self.x_mask = x_mask
+        self.o_mask = o_mask
+
+    @classmethod
+    def from_cells(cls, cells):
+        """
+        Builds a board from a sequence of 9 ASCII ordinals.
+
+        :param cells: sequence of int
+        :return: BitBoard
+        """
+        x_mask = 0
+        o_mask = 0
+
+        for position, cell in enumerate(cells):
+            if cell == X:
+                x_mask |= 1 << position
+            elif cell == O:
+                o_mask |= 1 << position
+
+        return cls(x_mask, o_mask)
+
+    def to_cells(self) -> list:
+        return list(self)
+
+    def __len__(self):
+        return BOARD_SIZE
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < BOARD_SIZE:
+            raise IndexError("board position out of range")
+
+        bit = 1 << position
+
+        if self.x_mask & bit:
+            return X
+
+        if self.o_mask & bit:
+            return O
+
+        return EMPTY
+
+    def __setitem__(self, position: int, identity: int):
+        if not 0 <= position < BOARD_SIZE:
+            raise IndexError("board position out of range")
+
+        bit = 1 << position
+        self.x_mask &= ~bit
+        self.o_mask &= ~bit
+
+        if identity == X:
+            self.x_mask |= bit
+        elif identity == O:
+            self.o_mask |= bit
+
+    def __iter__(self):
+        x_mask = self.x_mask
+        o_mask = self.o_mask
+
+        for position in range(BOARD_SIZE):
+            bit = 1 << position
+            yield X if x_mask & bit else O if o_mask & bit else EMPTY
+
+    def __eq__(self, other):
+        if isinstance(other, BitBoard):
+            return self.x_mask == other.x_mask and self.o_mask == other.o_mask
+
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return "BitBoard(x_mask=%#05x, o_mask=%#05x)" % (self.x_mask, self.o_mask)
+
+    def is_occupied(self, position: int) -> bool:
+        return bool((self.x_mask | self.o_mask) >> position & 1)
+
+    def open_mask(self) -> int:
+        return FULL_MASK & ~(self.x_mask | self.o_mask)
+
+    def winner(self):
+        """
+        Gets the winning player, if any.
+
+        :return: int X or O ordinal, or None
+        """
+        if WINNING_MASKS[self.x_mask]:
+            return X
+
+        if WINNING_MASKS[self.o_mask]:
+            return O
+
+        return None
+
+    def is_draw(self) -> bool:
+        return (self.x_mask | self.o_mask) == FULL_MASK and self.winner() is None
@@ -0,0 +1,72 @@
+"""
+Binary codec for the a4 / RPS protocol.
+
+Every request and response shape has a precompiled struct.Struct, so packing does not
+re-parse a format string per call, and responses decode into a slotted Message instead
+of nested dicts.
+"""
+
+from struct import Struct
+from constants import CONFIRM_RULESET, CONFIRMATION, GAME_ACTION, MAKE_MOVE, META_ACTION, QUIT
+
+# Requests: uid, msg_type, context, payload_length[, payload...]
+HANDSHAKE_REQUEST = Struct("!LBBBBB")  # payload is protocol version, game id
+META_REQUEST = Struct("!LBBB")
+GAME_REQUEST = Struct("!LBBBB")
+
+# Responses: msg_type, context, payload_length[, payload...]
+HEADER = Struct("!BBB")
+UID_PAYLOAD = Struct("<L")
+
+HANDSHAKE_PROTOCOL_VERSION = 1
+
+
+class Message:
+    """
+    A decoded server message.
+    """
+    __slots__ = ('msg_type', 'context', 'payload')
+
+    def __init__(self, msg_type: int, context: int, payload: bytes):
+        self.msg_type = msg_type
+        self.context = context
+        self.payload = payload
+
+    def __repr__(self):
+        return "Message(msg_type=%d, context=%d, payload=%s)" % (self.msg_type, self.context, list(self.payload))
+
+
+def pack_handshake(game_id: int) -> bytes:
+    """
+    Builds the handshake packet.
+
+    :param game_id: int
+    :return: bytes
+    """
+    # Starts with 4 'empty' uid bytes
+    return HANDSHAKE_REQUEST.pack(0, CONFIRMATION, CONFIRM_RULESET, 2, HANDSHAKE_PROTOCOL_VERSION, game_id)
+
+
+def pack_turn(uid: int, proposed_play) -> bytes:
+    """
+    Builds the request packet for a play, or for quitting if the play is 'Q'.
+
+    :param uid: int uid of player
+    :param proposed_play: str position / play, or 'Q'
+    :return: bytes
+    """
+    if proposed_play == 'Q':
+        return META_REQUEST.pack(uid, META_ACTION, QUIT, 0)
+
+    return GAME_REQUEST.pack(uid, GAME_ACTION, MAKE_MOVE, 1, int(proposed_play))
+
+
+def request_type(proposed_play) -> int:
+    """
+    Gets the REQ_TYPES value pack_turn uses for a play.
+
+    :param proposed_play: str position / play, or 'Q'
+    :return: int
+    """
+    return META_ACTION if proposed_play == 'Q' else GAME_ACTION
+
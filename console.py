@@ -0,0 +1,140 @@
+"""
+Prompting for plays without going deaf to the server.
+
+prompt() waits on stdin and the game socket together with selectors, so a server message that
+arrives while the player is typing, like an END_OF_GAME after the opponent quits or the server
+closing the connection, abandons the prompt straight away. The message itself is left unread
+for the client loop to handle as usual.
+"""
+
+import os
+import selectors
+import sys
+from protocol import get_reader
+
+STDIN_CHUNK = 4096
+
+
+class StdinLines:
+    """
+    Line buffer over the stdin file descriptor.
+
+    Reads go straight to the descriptor, so a line that has been read but not used yet is
+    visible here; sys.stdin would hide it in its own buffer, out of reach of select.
+    """
+
+    def __init__(self, fd: int):
+        self.__fd = fd
+        self.__buffer = bytearray()
+        self.__eof = False
+
+    def pop_line(self) -> str:
+        """
+        :return: str the next complete line without its newline, or None if none is buffered
+        :raises EOFError: once stdin is exhausted, like input()
+        """
+        end = self.__buffer.find(b"\n")
+
+        if end < 0:
+            if not self.__eof:
+                return None
+
+            if not self.__buffer:
+                raise EOFError("stdin closed")
+
+            end = len(self.__buffer)
+
+        line = self.__buffer[:end].decode(errors="replace").rstrip("\r")
+        del self.__buffer[:end + 1]
+
+        return line
+
+    def fill(self):
+        data = os.read(self.__fd, STDIN_CHUNK)
+
+        if data:
+            self.__buffer += data
+        else:
+            self.__eof = True
+
+    def discard(self):
+        """
+        Drops anything typed but not used yet, so it is not taken as the answer to the next prompt.
+        """
+        self.__buffer.clear()
+
+        if not os.isatty(self.__fd):
+            return
+
+        try:
+            import termios
+        except ImportError:
+            return
+
+        termios.tcflush(self.__fd, termios.TCIFLUSH)
+
+
+_stdin = None
+
+
+def _get_stdin() -> StdinLines:
+    global _stdin
+
+    if _stdin is None:
+        _stdin = StdinLines(sys.stdin.fileno())
+
+    return _stdin
+
+
+def prompt(s, invitation: str) -> str:
+    """
+    Asks the player for a line of input while watching the socket.
+
+    :param s: socket the game is played on
+    :param invitation: str prompt to show
+    :return: str the line entered, or None if the server sent something first
+    :raises EOFError: if stdin is closed
+    """
+    stdin = _get_stdin()
+    stdin_fd = sys.stdin.fileno()
+    reader = get_reader(s)
+
+    sys.stdout.write(invitation)
+    sys.stdout.flush()
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(s, selectors.EVENT_READ)
+
+        try:
+            selector.register(stdin_fd, selectors.EVENT_READ)
+            stdin_selectable = True
+        except (OSError, ValueError):
+            # e.g. stdin redirected from a regular file, which is always readable
+            stdin_selectable = False
+
+        while True:
+            line = stdin.pop_line()
+
+            if line is not None:
+                return line
+
+            if reader.buffered():
+                return _abandon(stdin)
+
+            if not stdin_selectable:
+                stdin.fill()
+                continue
+
+            for key, _ in selector.select():
+                if key.fd == stdin_fd:
+                    stdin.fill()
+                else:
+                    return _abandon(stdin)
+
+
+def _abandon(stdin: StdinLines):
+    # End the prompt's line so the server's news does not print after it
+    sys.stdout.write("\n")
+    stdin.discard()
+
+    return None
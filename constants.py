@@ -0,0 +1,114 @@
+"""
+Protocol constants as plain integers, for the code that runs on every message.
+
+metadata.py builds its enums from these values and re-exports them; import from here where the
+enum classes are not needed, so they are not built at startup.
+"""
+
+ENDIANNESS = 'little'
+
+# STATUS_CODES
+SUCCESS = 10
+UPDATE = 20
+CLIENT_INVALID_REQUEST = 30
+CLIENT_INVALID_UID = 31
+CLIENT_INVALID_TYPE = 32
+CLIENT_INVALID_CONTEXT = 33
+CLIENT_INVALID_PAYLOAD = 34
+SERVER_ERROR = 40
+INVALID_ACTION = 50
+ACTION_OUT_OF_TURN = 51
+
+# REQ_TYPES
+CONFIRMATION = 1
+INFORMATION = 2
+META_ACTION = 3
+GAME_ACTION = 4
+
+# REQ_CONTEXTS
+CONFIRM_RULESET = 1
+MAKE_MOVE = 1
+QUIT = 1
+
+# UPD_CONTEXTS
+START_GAME = 1
+MOVE_MADE = 2
+END_OF_GAME = 3
+
+# OUTCOMES
+WIN = 1
+LOSS = 2
+TIE = 3
+
+# GAMES
+TTT = 1
+RPS = 2
+
+# RPS_PLAYS
+ROCK = 1
+PAPER = 2
+SCISSORS = 3
+
+# IDs
+ID_X = 88
+ID_O = 79
+
+CODES = {
+    "WELCOME": 1,
+    "INVITE": 4,
+    "INVALID": 5,
+    "ACCEPTED": 6,
+    "WIN": 7,
+    "LOSE": 8,
+    "TIE": 9,
+    "DISCONNECT": 10,
+    "VERSION": 11
+}
+
+MESSAGES = {
+    1: "Welcome",
+    4: "Your turn! What is your move?",
+    5: "Invalid move. Try again",
+    6: "Move accepted",
+    7: "You win!",
+    8: "You lose!",
+    9: "Tie game",
+    88: "You are X",
+    79: "You are O",
+    11: "Version number",
+    10: "Opponent has disconnected. Please stand by."
+}
+
+IDENTITIES = {
+    "X": ID_X,
+    "O": ID_O,
+    "x": ID_X,
+    "o": ID_O
+}
+
+RESPONSE_MESSAGES = {
+    CLIENT_INVALID_REQUEST: "Invalid request",
+    CLIENT_INVALID_UID: "Invalid uid supplied",
+    CLIENT_INVALID_TYPE: "Invalid msg_type",
+    CLIENT_INVALID_CONTEXT: "Invalid context supplied",
+    CLIENT_INVALID_PAYLOAD: "Invalid payload supplied",
+    INVALID_ACTION: "Invalid play",
+    ACTION_OUT_OF_TURN: "Not your turn",
+}
+
+EOF_MESSAGES = {
+    WIN: " win!",
+    LOSS: "lose!",
+    TIE: " tie!"
+}
+
+STATUS_MESSAGES = {
+    10: "success",
+    20: "update",
+    30: "invalid_type",
+    31: "invalid context",
+    32: "invalid payload",
+    40: "server error",
+    50: "invalid action",
+    51: "action out of turn"
+}
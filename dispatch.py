@@ -0,0 +1,178 @@
+"""
+Registry of protocol handlers, so the client loops dispatch each server message with one indexed lookup.
+
+Each game and protocol version registers a Protocol: a factory for its GameData, a decoder that
+reads the next message off the socket and turns it into an integer code, and a handler table
+indexed by that code. The client loops only decode and dispatch, so supporting another version
+means registering another Protocol rather than editing a loop.
+"""
+
+from protocol import get_message, get_reader
+from constants import UPDATE
+
+# Legacy (v1/v2) messages are a single byte code
+LEGACY_CODES = 256
+
+# a4 responses are coded by msg_type and updates by UPDATE_CODE + context, so one table holds both
+UPDATE_CODE = 256
+A4_CODES = 512
+
+_protocols = {}
+
+
+class GameState:
+    """
+    What the handlers of one game share: the connection, the game data and the loop's progress.
+    """
+    __slots__ = ('s', 'game_data', 'result', 'owes_turn', 'proposed_play', 'over')
+
+    def __init__(self, s, game_data, result=None):
+        self.s = s
+        self.game_data = game_data
+        self.result = result
+        self.owes_turn = False
+        self.proposed_play = None
+        self.over = False
+
+
+def _ignore(state: GameState, message):
+    return None
+
+
+class Protocol:
+    """
+    One game's protocol version.
+
+    Handlers are called as handler(state, message) and their return value is passed back by
+    dispatch. Codes without a handler of their own go to the fallback, which ignores them
+    unless another is set.
+    """
+
+    def __init__(self, game_factory, decoder, codes: int, handlers: dict = None, fallback=None):
+        """
+        :param game_factory: callable returning a new GameData for a game
+        :param decoder: callable(state) reading the next message, returning (code, message)
+        :param codes: int size of the handler table; every code the decoder returns is below it
+        :param handlers: dict of code to handler
+        :param fallback: handler for codes without one, None to ignore them
+        """
+        self.__game_factory = game_factory
+        self.__decoder = decoder
+        self.__fallback = fallback or _ignore
+        self.__handlers = [self.__fallback] * codes
+        self.__registered = set()
+
+        for code, handler in (handlers or {}).items():
+            self.set_handler(code, handler)
+
+    def set_handler(self, code: int, handler):
+        self.__handlers[code] = handler
+        self.__registered.add(code)
+
+    def set_fallback(self, handler):
+        self.__fallback = handler or _ignore
+
+        for code in range(len(self.__handlers)):
+            if code not in self.__registered:
+                self.__handlers[code] = self.__fallback
+
+    def new_game(self):
+        return self.__game_factory()
+
+    def read(self, state: GameState) -> tuple:
+        """
+        :param state: GameState
+        :return: tuple of (int code, message)
+        """
+        return self.__decoder(state)
+
+    def dispatch(self, state: GameState, code: int, message):
+        return self.__handlers[code](state, message)
+
+    def handle_next(self, state: GameState):
+        """
+        Reads the next message and hands it to its handler.
+
+        :param state: GameState
+        :return: whatever the handler returns
+        """
+        code, message = self.__decoder(state)
+
+        return self.__handlers[code](state, message)
+
+
+def decode_legacy(state: GameState) -> tuple:
+    """
+    :return: tuple of (int code, int code); legacy messages carry nothing beyond their code
+    """
+    data = get_reader(state.s).read_exact(state.game_data.get_bytes_to_expect())
+    code = int.from_bytes(data, 'big')
+
+    # Codes wider than a byte are not part of the protocol; 0 has no handler
+    return (code if code < LEGACY_CODES else 0), code
+
+
+def decode_a4(state: GameState) -> tuple:
+    """
+    :return: tuple of (int code, Message)
+    """
+    message = get_message(state.s)
+
+    if message.msg_type == UPDATE:
+        return UPDATE_CODE + message.context, message
+
+    return message.msg_type, message
+
+
+def register(game_id: int, version: int, protocol: Protocol) -> Protocol:
+    """
+    :param game_id: int GAMES value
+    :param version: int protocol version
+    :param protocol: Protocol
+    :return: Protocol
+    """
+    _protocols[(game_id, version)] = protocol
+
+    return protocol
+
+
+def register_module(game_id: int, version: int, module: str):
+    """
+    Registers a protocol by the module that registers it, so the module is only imported
+    when a game of that version is played.
+
+    :param game_id: int GAMES value
+    :param version: int protocol version
+    :param module: str name of a module that calls register for this game and version
+    :return: void
+    """
+    _protocols[(game_id, version)] = module
+
+
+def get_protocol(game_id: int, version: int) -> Protocol:
+    """
+    :param game_id: int GAMES value
+    :param version: int protocol version
+    :return: Protocol
+    :raises ValueError: if nothing is registered for that game and version
+    """
+    key = (game_id, version)
+
+    try:
+        protocol = _protocols[key]
+    except KeyError:
+        raise ValueError("Invalid protocol specified") from None
+
+    if isinstance(protocol, str):
+        __import__(protocol)
+        protocol = _protocols[key]
+
+    return protocol
+
+
+def get_versions(game_id: int) -> list:
+    """
+    :param game_id: int GAMES value
+    :return: list of int protocol versions registered for the game, in order
+    """
+    return sorted(version for game, version in _protocols if game == game_id)
@@ -0,0 +1,167 @@
+"""
+Perfect-play tic-tac-toe engine.
+
+Every reachable position is solved once into a transposition table keyed by its
+canonical form under the 8 board symmetries, so a move is a table lookup.
+"""
+
+from bitboard import BitBoard, BOARD_SIZE, FULL_MASK, INVERSE_SYMMETRIES, SYMMETRIES, WINNING_MASKS, X, O
+
+
+def _build_mask_transforms() -> tuple:
+    transforms = []
+
+    for symmetry in SYMMETRIES:
+        table = []
+
+        for mask in range(FULL_MASK + 1):
+            moved = 0
+
+            for position in range(BOARD_SIZE):
+                if mask >> position & 1:
+                    moved |= 1 << symmetry[position]
+
+            table.append(moved)
+
+        transforms.append(tuple(table))
+
+    return tuple(transforms)
+
+
+# MASK_TRANSFORMS[s][mask] is mask with every cell moved by symmetry s
+MASK_TRANSFORMS = _build_mask_transforms()
+
+POPCOUNT = tuple(bin(mask).count('1') for mask in range(FULL_MASK + 1))
+
+
+def canonicalize(x_mask: int, o_mask: int) -> tuple:
+    """
+    Finds the smallest key among the 8 symmetric images of a position.
+
+    :param x_mask: int
+    :param o_mask: int
+    :return: tuple of (canonical key, index of the symmetry that produces it)
+    """
+    best_key = None
+    best_symmetry = 0
+
+    for index, transform in enumerate(MASK_TRANSFORMS):
+        key = transform[x_mask] | transform[o_mask] << BOARD_SIZE
+
+        if best_key is None or key < best_key:
+            best_key = key
+            best_symmetry = index
+
+    return best_key, best_symmetry
+
+
+def player_to_move(x_mask: int, o_mask: int) -> int:
+    return X if POPCOUNT[x_mask] == POPCOUNT[o_mask] else O
+
+
+class Engine:
+    """
+    Transposition table of every reachable, non-terminal position.
+
+    Each entry maps a canonical key to (score, best move in the canonical frame). Scores are
+    from the point of view of the player to move: positive wins, 0 draws, negative loses, and
+    faster wins score higher.
+    """
+
+    def __init__(self):
+        self.__table = {}
+        self.__solve(0, 0)
+
+    def __len__(self):
+        return len(self.__table)
+
+    def get_table(self) -> dict:
+        return self.__table
+
+    def __solve(self, mover: int, waiting: int) -> int:
+        """
+        Negamax over canonical positions.
+
+        :param mover: int mask of the player to move
+        :param waiting: int mask of the other player
+        :return: int score for the player to move
+        """
+        occupied = mover | waiting
+
+        if WINNING_MASKS[waiting]:
+            return -(BOARD_SIZE + 1 - POPCOUNT[occupied])
+
+        if occupied == FULL_MASK:
+            return 0
+
+        x_mask, o_mask = (mover, waiting) if POPCOUNT[mover] == POPCOUNT[waiting] else (waiting, mover)
+        key, symmetry = canonicalize(x_mask, o_mask)
+
+        entry = self.__table.get(key)
+        if entry is not None:
+            return entry[0]
+
+        best_score = None
+        best_move = None
+
+        for position in range(BOARD_SIZE):
+            bit = 1 << position
+
+            if occupied & bit:
+                continue
+
+            score = -self.__solve(waiting, mover | bit)
+
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = position
+
+        self.__table[key] = (best_score, SYMMETRIES[symmetry][best_move])
+
+        return best_score
+
+    def lookup(self, board) -> tuple:
+        """
+        Looks up a position.
+
+        :param board: BitBoard or sequence of 9 ASCII ordinals
+        :return: tuple of (score for the player to move, best position)
+        """
+        if not isinstance(board, BitBoard):
+            board = BitBoard.from_cells(board)
+
+        key, symmetry = canonicalize(board.x_mask, board.o_mask)
+        entry = self.__table.get(key)
+
+        if entry is None:
+            raise ValueError("position is finished or unreachable: " + repr(board))
+
+        score, canonical_move = entry
+
+        return score, INVERSE_SYMMETRIES[symmetry][canonical_move]
+
+    def best_move(self, board) -> int:
+        """
+        Gets the optimal move for the player to move.
+
+        :param board: BitBoard or sequence of 9 ASCII ordinals
+        :return: int position
+        """
+        return self.lookup(board)[1]
+
+
+_engine = None
+
+
+def get_engine() -> Engine:
+    """
+    Gets the shared engine, solving the game on first use.
+
+    :return: Engine
+    """
+    global _engine
+
+    if _engine is None:
+        _engine = Engine()
+
+    return _engine
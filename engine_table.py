@@ -0,0 +1,164 @@
+"""
+Solved-position table on disk, opened with mmap.
+
+The file is a short header followed by one byte per board, indexed by the board's base-3
+number (cell i contributes 3^i for X and 2 * 3^i for O). Each byte is the engine's best
+move for that position, or NO_MOVE for finished and unreachable boards. Opening the file
+costs one mmap, and each lookup is a single read from the mapping.
+
+usage:
+    python3 engine_table.py PATH
+"""
+
+import mmap
+import os
+import sys
+from struct import Struct
+from bitboard import BitBoard, BOARD_SIZE, FULL_MASK, X, O, EMPTY
+
+MAGIC = b"TTTE"
+TABLE_VERSION = 1
+TABLE_HEADER = Struct("<4sHH")  # magic, version, reserved
+ENTRY_COUNT = 3 ** BOARD_SIZE
+NO_MOVE = 0xFF
+
+# TERNARY[mask] is the sum of 3^i over the cells set in mask
+TERNARY = tuple(sum(3 ** i for i in range(BOARD_SIZE) if mask >> i & 1) for mask in range(FULL_MASK + 1))
+
+
+def board_index(board) -> int:
+    """
+    Gets the table index of a board.
+
+    :param board: BitBoard or sequence of 9 ASCII ordinals
+    :return: int
+    """
+    if not isinstance(board, BitBoard):
+        board = BitBoard.from_cells(board)
+
+    return TERNARY[board.x_mask] + 2 * TERNARY[board.o_mask]
+
+
+def index_to_cells(index: int) -> list:
+    """
+    Decodes a table index back into a board.
+
+    :param index: int
+    :return: list of 9 ASCII ordinals
+    """
+    cells = []
+
+    for _ in range(BOARD_SIZE):
+        index, digit = divmod(index, 3)
+        cells.append((EMPTY, X, O)[digit])
+
+    return cells
+
+
+def build_entries(engine=None) -> bytearray:
+    """
+    Gets the engine's best move for every board, in table order.
+
+    :param engine: engine.Engine, the shared one if None
+    :return: bytearray of ENTRY_COUNT moves, NO_MOVE where there is none
+    """
+    if engine is None:
+        from engine import get_engine
+        engine = get_engine()
+
+    entries = bytearray([NO_MOVE]) * ENTRY_COUNT
+
+    for index in range(ENTRY_COUNT):
+        try:
+            entries[index] = engine.best_move(index_to_cells(index))
+        except ValueError:
+            pass
+
+    return entries
+
+
+def write_table(path: str, engine=None):
+    """
+    Serializes the engine's best moves for every board.
+
+    Written to a temporary file and renamed into place, so concurrent workers never map a
+    half-written table.
+
+    :param path: str
+    :param engine: engine.Engine, the shared one if None
+    :return: void
+    """
+    entries = build_entries(engine)
+    temporary_path = path + ".tmp" + str(os.getpid())
+
+    with open(temporary_path, "wb") as table_file:
+        table_file.write(TABLE_HEADER.pack(MAGIC, TABLE_VERSION, 0))
+        table_file.write(entries)
+
+    os.replace(temporary_path, path)
+
+
+class MappedEngine:
+    """
+    Engine backed by a table file written by write_table.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as table_file:
+            self.__table = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.__table) != TABLE_HEADER.size + ENTRY_COUNT:
+            raise ValueError("engine table has the wrong size: " + path)
+
+        magic, version, _ = TABLE_HEADER.unpack_from(self.__table)
+
+        if magic != MAGIC or version != TABLE_VERSION:
+            raise ValueError("not an engine table, or an unsupported version: " + path)
+
+    def close(self):
+        self.__table.close()
+
+    def get_entries(self) -> memoryview:
+        """
+        The moves themselves, indexed by board_index, for bulk lookups such as batch.best_moves.
+
+        The mapping cannot be closed while the view or anything built on it is alive.
+
+        :return: memoryview
+        """
+        return memoryview(self.__table)[TABLE_HEADER.size:]
+
+    def best_move(self, board) -> int:
+        """
+        Gets the optimal move for the player to move.
+
+        :param board: BitBoard or sequence of 9 ASCII ordinals
+        :return: int position
+        """
+        move = self.__table[TABLE_HEADER.size + board_index(board)]
+
+        if move == NO_MOVE:
+            raise ValueError("position is finished or unreachable: " + repr(board))
+
+        return move
+
+
+def open_table(path: str) -> MappedEngine:
+    """
+    Maps an engine table, solving and writing it first if the file does not exist yet.
+
+    :param path: str
+    :return: MappedEngine
+    """
+    if not os.path.exists(path):
+        write_table(path)
+
+    return MappedEngine(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python3 engine_table.py PATH")
+        exit(1)
+
+    write_table(sys.argv[1])
@@ -0,0 +1,115 @@
+"""
+Typed exceptions for server status codes and client-side failures.
+"""
+
+from constants import (ACTION_OUT_OF_TURN, CLIENT_INVALID_CONTEXT, CLIENT_INVALID_PAYLOAD, CLIENT_INVALID_REQUEST,
+                       CLIENT_INVALID_TYPE, CLIENT_INVALID_UID, INVALID_ACTION, RESPONSE_MESSAGES, SERVER_ERROR,
+                       STATUS_MESSAGES)
+
+
+class GameClientError(Exception):
+    """
+    Base class for every error raised by the client library.
+    """
+
+
+class InvalidPlayError(GameClientError, ValueError):
+    """
+    A play that cannot be sent, e.g. an unknown RPS play.
+    """
+
+
+class ProtocolError(GameClientError):
+    """
+    The server sent something the client cannot make sense of.
+    """
+
+
+class ConnectionClosedError(GameClientError, ConnectionError):
+    """
+    The server closed the connection while a message was expected.
+    """
+
+
+class ReadTimeoutError(GameClientError, TimeoutError):
+    """
+    A message did not arrive in full before its deadline.
+    """
+
+
+class StatusError(GameClientError):
+    """
+    The server answered with an error status.
+    """
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        message = RESPONSE_MESSAGES.get(status_code) or STATUS_MESSAGES.get(status_code, "status " + str(status_code))
+
+        super().__init__(message)
+
+
+class ClientRequestError(StatusError):
+    """
+    The server rejected the request itself (CLIENT_ERRORS).
+    """
+
+
+class InvalidRequestError(ClientRequestError):
+    pass
+
+
+class InvalidUidError(ClientRequestError):
+    pass
+
+
+class InvalidTypeError(ClientRequestError):
+    pass
+
+
+class InvalidContextError(ClientRequestError):
+    pass
+
+
+class InvalidPayloadError(ClientRequestError):
+    pass
+
+
+class ServerError(StatusError):
+    pass
+
+
+class GameActionError(StatusError):
+    """
+    The request was well formed but the play was not allowed (GAME_ERRORS).
+    """
+
+
+class InvalidActionError(GameActionError):
+    pass
+
+
+class ActionOutOfTurnError(GameActionError):
+    pass
+
+
+STATUS_ERRORS = {
+    CLIENT_INVALID_REQUEST: InvalidRequestError,
+    CLIENT_INVALID_UID: InvalidUidError,
+    CLIENT_INVALID_TYPE: InvalidTypeError,
+    CLIENT_INVALID_CONTEXT: InvalidContextError,
+    CLIENT_INVALID_PAYLOAD: InvalidPayloadError,
+    SERVER_ERROR: ServerError,
+    INVALID_ACTION: InvalidActionError,
+    ACTION_OUT_OF_TURN: ActionOutOfTurnError,
+}
+
+
+def error_for_status(status_code: int) -> StatusError:
+    """
+    Builds the exception for an error status.
+
+    :param status_code: int STATUS_CODES value
+    :return: StatusError
+    """
+    return STATUS_ERRORS.get(status_code, StatusError)(status_code)
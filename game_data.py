@@ -1,55 +1,76 @@
 import socket
-from metadata import ENDIANNESS
+import sys
+from bitboard import BitBoard
+from console import prompt
+from errors import InvalidPlayError
+from constants import ENDIANNESS
+from protocol import get_reader
 
 UID_LENGTH = 4
+EMPTY_BOARD = bytes((45,)) * 9
 
+# The whole board update as one string, so it goes out in a single write
+BOARD_TEMPLATE = "Board update:\n%s|%s|%s\n-+-+-\n%s|%s|%s\n-+-+-\n%s|%s|%s\n"
 
-def printSeparator(count: int):
+# Maps each cell's ASCII ordinal to what is drawn for it: X and O as themselves, anything else blank
+CELL_TABLE = bytes(cell if cell in (88, 79) else 32 for cell in range(256))
+
+quiet = False
+
+# Book every new GameData_a4 starts with, see set_opening_book
+opening_book = None
+
+
+def set_quiet(is_quiet: bool):
     """
-    Prints out formatted characters for the board.
+    Turns board rendering off, e.g. for bots nobody is watching.
 
-    :param count: int
+    :param is_quiet: bool
     :return: void
     """
-    if count == 0 or count == 3 or count == 6:
-        print("|", end='')
-        return
+    global quiet
+    quiet = is_quiet
 
-    if count == 1 or count == 4 or count == 7:
-        print("|", end='')
-        return
 
-    if count == 2 or count == 5:
-        print('')
-        print("-+-+-")
-        return
+def set_opening_book(book):
+    """
+    Gives every GameData_a4 created from now on an opening book.
 
-    if count == 8:
-        print('')
-        return
+    :param book: opening_book.OpeningBook, or None for no book
+    :return: void
+    """
+    global opening_book
+    opening_book = book
 
 
-def update_board(s) -> list:
+def render_board(board) -> str:
     """
-    Updates the local game board.
+    Draws a board.
 
-    :param s: socket
-    :return: list
+    :param board: bytearray, BitBoard or other sequence of 9 ASCII ordinals
+    :return: str
     """
-    play = s.recv(9)
+    return BOARD_TEMPLATE % tuple(bytes(board).translate(CELL_TABLE).decode('ascii'))
 
-    board_bytes = play.decode()
 
-    new_board = [ord(board_bytes[i:i + 1]) for i in range(0, len(board_bytes), 1)]
+def update_board(s) -> bytearray:
+    """
+    Updates the local game board.
 
-    return new_board
+    :param s: socket
+    :return: bytearray
+    """
+    return bytearray(get_reader(s).read_exact(9))
 
 
 class GameData:
 
-    def __init__(self):
+    def __init__(self, board=None):
+        """
+        :param board: board backend, e.g. a BitBoard; a bytearray of ASCII ordinals if None
+        """
         self.__identity = None
-        self.__game_board = [45, 45, 45, 45, 45, 45, 45, 45, 45]
+        self.__game_board = board if board is not None else bytearray(EMPTY_BOARD)
         self.__bytes_to_expect = 1
         self.__version = 1
         self.__adversary = None
@@ -60,6 +81,34 @@ class GameData:
     def get_game_board(self):
         return self.__game_board
 
+    def get_board_array(self):
+        """
+        Gets the board as a NumPy uint8 array of ASCII ordinals, for batch.py.
+
+        The default bytearray board is shared, not copied, so writes through the array change
+        the board. Other backends are converted.
+
+        :return: numpy.ndarray of shape (9,)
+        """
+        import numpy
+
+        if isinstance(self.__game_board, bytearray):
+            return numpy.frombuffer(self.__game_board, dtype=numpy.uint8)
+
+        return numpy.frombuffer(bytes(self.__game_board), dtype=numpy.uint8)
+
+    def set_board_array(self, cells):
+        """
+        Replaces the board with the contents of an array in the get_board_array layout.
+
+        :param cells: numpy.ndarray of 9 uint8 ASCII ordinals, or anything else exposing that buffer
+        :return: void
+        """
+        if isinstance(self.__game_board, BitBoard):
+            self.__game_board = BitBoard.from_cells(bytes(cells))
+        else:
+            self.__game_board = bytearray(cells)
+
     def get_bytes_to_expect(self):
         return self.__bytes_to_expect
 
@@ -72,7 +121,12 @@ class GameData:
         return self.__adversary
 
     def set_game_board(self, s: socket):
-        self.__game_board = update_board(s)
+        new_board = update_board(s)
+
+        if isinstance(self.__game_board, BitBoard):
+            new_board = BitBoard.from_cells(new_board)
+
+        self.__game_board = new_board
 
     def set_bytes_to_expect(self, bytes_to_expect):
         self.__bytes_to_expect = bytes_to_expect
@@ -85,28 +139,14 @@ class GameData:
 
     def print_board(self):
         """
-        Prints the board in a formatted way.
+        Prints the board in a formatted way, unless rendering is quiet.
 
         :return:  void
         """
+        if quiet:
+            return
 
-        print("Board update:")
-
-        count = 0
-
-        for c in self.__game_board:
-            i = int(c)
-
-            char_to_print = chr(i)
-
-            if char_to_print in ('X', 'O'):
-                print(chr(i), end='')
-            else:
-                print(" ", end='')
-
-            printSeparator(count)
-
-            count += 1
+        sys.stdout.write(render_board(self.__game_board))
 
     def make_play(self, s: socket, invitation: str):
         proposed_play = -1
@@ -132,7 +172,7 @@ class GameData:
     def process_welcome(self, s: socket, message: str):
         print(message)
 
-        self.set_identity(int.from_bytes(s.recv(self.get_bytes_to_expect()), 'big'))
+        self.set_identity(int.from_bytes(get_reader(s).read_exact(self.get_bytes_to_expect()), 'big'))
         print("You are player", chr(self.get_identity()))
 
     def check_if_spot_is_played(self, play: int):
@@ -156,8 +196,8 @@ class GameData:
 
 
 class GameData_v2(GameData):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, board=None):
+        super().__init__(board)
         self.__game_id = None
         super().set_version(2)
 
@@ -178,7 +218,7 @@ class GameData_v2(GameData):
 
     def process_welcome(self, s: socket, message: str):
         super().process_welcome(s, message)
-        sent_id = int.from_bytes(s.recv(self.get_bytes_to_expect()), 'big')
+        sent_id = int.from_bytes(get_reader(s).read_exact(self.get_bytes_to_expect()), 'big')
         self.set_game_id(sent_id)
 
     def __str__(self):
@@ -188,11 +228,38 @@ class GameData_v2(GameData):
 
 
 class GameData_a4(GameData):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, board=None):
+        super().__init__(board)
         self.__uid = None
+        self.__engine = None
+        self.__book = opening_book
         super().set_version(4)
 
+    def set_engine(self, engine):
+        """
+        Lets make_play pick moves with an engine instead of asking for input.
+
+        :param engine: anything with best_move(board), e.g. engine.Engine; None for human input
+        :return: void
+        """
+        self.__engine = engine
+
+    def get_engine(self):
+        return self.__engine
+
+    def set_opening_book(self, book):
+        """
+        Lets make_play answer positions in the book without asking the engine or the player.
+
+        :param book: anything with best_move(board) returning None outside the book, e.g.
+                     opening_book.OpeningBook; None for no book
+        :return: void
+        """
+        self.__book = book
+
+    def get_opening_book(self):
+        return self.__book
+
     def set_uid(self, new_uid: int):
         self.__uid = new_uid
 
@@ -203,11 +270,27 @@ class GameData_a4(GameData):
         return int(self.__uid).to_bytes(UID_LENGTH, ENDIANNESS)
 
     def make_play(self, s: socket, invitation: str) -> str:
-        proposed_play = input(invitation)
+        """
+        Gets the next play from the opening book, the engine, or the player.
 
-        while not self.is_play_valid(proposed_play):
+        :param s: socket, watched while the player types
+        :param invitation: str prompt
+        :return: str position or 'Q', or None if the server sent something before a play was entered
+        """
+        if self.__book is not None:
+            move = self.__book.best_move(self.get_game_board())
+
+            if move is not None:
+                return str(move)
+
+        if self.__engine is not None:
+            return str(self.__engine.best_move(self.get_game_board()))
+
+        proposed_play = prompt(s, invitation)
+
+        while proposed_play is not None and not self.is_play_valid(proposed_play):
             print("Invalid play")
-            proposed_play = input(invitation)
+            proposed_play = prompt(s, invitation)
 
         if proposed_play == 'q':
             proposed_play = 'Q'
@@ -230,19 +313,70 @@ class GameData_a4(GameData):
 
 
 class GameData_rps(GameData_a4):
-    def __init__(self):
-        super().__init__()
-        __my_play = None
-        __adversary_play = None
+    def __init__(self, board=None):
+        super().__init__(board)
+        self.__my_play = None
+        self.__adversary_play = None
+        self.__strategy = None
 
-    def make_play(self, s: socket, invitation: str) -> int:
-        proposed_play = input(invitation)
+    def set_strategy(self, strategy):
+        """
+        Lets make_play pick plays with a strategy instead of asking for input.
+
+        :param strategy: anything with choose() and observe(own_play, adversary_play), e.g.
+                         rps_strategy.MarkovStrategy; None for human input
+        :return: void
+        """
+        self.__strategy = strategy
 
-        while not self.is_play_valid(proposed_play):
+    def get_strategy(self):
+        return self.__strategy
+
+    def get_my_play(self) -> int:
+        return self.__my_play
+
+    def get_adversary_play(self) -> int:
+        return self.__adversary_play
+
+    def end_game(self, adversary_play: int):
+        """
+        Records the adversary's play from END_OF_GAME and lets the strategy learn from it.
+
+        :param adversary_play: int RPS_PLAYS value, or 0 if the adversary never played
+        :return: void
+        """
+        self.__adversary_play = adversary_play
+
+        if self.__strategy is not None:
+            self.__strategy.observe(self.__my_play, adversary_play)
+
+    def make_play(self, s: socket, invitation: str):
+        """
+        Gets the next play from the strategy, or from the player.
+
+        :param s: socket, watched while the player types
+        :param invitation: str prompt
+        :return: int play or 'Q', or None if the server sent something before a play was entered
+        """
+        if self.__strategy is not None:
+            self.__my_play = self.__strategy.choose()
+            return self.__my_play
+
+        proposed_play = prompt(s, invitation)
+
+        while proposed_play is not None and not self.is_play_valid(proposed_play):
             print("Invalid play")
-            proposed_play = input(invitation)
+            proposed_play = prompt(s, invitation)
+
+        if proposed_play is None:
+            return None
+
+        if proposed_play in ('q', 'Q'):
+            return 'Q'
+
+        self.__my_play = self.convert_play_to_int(proposed_play)
 
-        return self.convert_play_to_int(proposed_play)
+        return self.__my_play
 
     def is_play_valid(self, play: str) -> bool:  # Will this method get called, or the parent method??
         if play in ('r', 'R', 'p', 'P', 's', 'S', 'q', 'Q'):
@@ -260,5 +394,4 @@ class GameData_rps(GameData_a4):
         if play in ('s', 'S'):
             return 3
 
-        print("Unknown play received")
-        exit(1)
+        raise InvalidPlayError("Unknown play received: " + repr(play))
@@ -0,0 +1,203 @@
+"""
+Optional hot-path instrumentation.
+
+Off by default; the instrumented code only checks the module-level enabled flag. Once enabled,
+it counts bytes in/out and syscalls, the time spent blocked in recv, and request-to-response
+latency per (REQ_TYPES, STATUS_CODES) pair. Latencies go into fixed-size power-of-two histograms.
+
+Metrics can be read in-process with snapshot(), dumped on exit with dump_on_exit(), or scraped
+from a running client by sending it SIGUSR1.
+"""
+
+import atexit
+import sys
+
+enabled = False
+
+# Bucket i holds values below 2^i microseconds; the last bucket takes everything larger
+BUCKET_COUNT = 32
+
+
+class Histogram:
+    __slots__ = ('buckets', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def record(self, seconds: float):
+        self.buckets[min(int(seconds * 1000000).bit_length(), BUCKET_COUNT - 1)] += 1
+        self.count += 1
+        self.total += seconds
+
+        if self.minimum is None or seconds < self.minimum:
+            self.minimum = seconds
+
+        if self.maximum is None or seconds > self.maximum:
+            self.maximum = seconds
+
+    def merge(self, other):
+        """
+        Adds another histogram's samples into this one, e.g. one collected in another process.
+
+        :param other: Histogram
+        :return: void
+        """
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+
+        if other.minimum is not None and (self.minimum is None or other.minimum < self.minimum):
+            self.minimum = other.minimum
+
+        if other.maximum is not None and (self.maximum is None or other.maximum > self.maximum):
+            self.maximum = other.maximum
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound of the bucket holding the given fraction of samples.
+
+        :param fraction: float between 0 and 1
+        :return: float seconds, or None if empty
+        """
+        if not self.count:
+            return None
+
+        rank = fraction * self.count
+        seen = 0
+
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+
+            if seen >= rank and bucket:
+                return min((1 << index) / 1000000, self.maximum)
+
+        return self.maximum
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.minimum,
+            "max": self.maximum,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class Metrics:
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.recv_calls = 0
+        self.send_calls = 0
+        self.messages_in = 0
+        self.recv_blocked = Histogram()
+        self.handshake = Histogram()
+        self.responses = {}
+
+    def response_histogram(self, req_type: int, status: int) -> Histogram:
+        key = (req_type, status)
+        histogram = self.responses.get(key)
+
+        if histogram is None:
+            histogram = self.responses[key] = Histogram()
+
+        return histogram
+
+    def snapshot(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "recv_calls": self.recv_calls,
+            "send_calls": self.send_calls,
+            "messages_in": self.messages_in,
+            "recv_blocked": self.recv_blocked.snapshot(),
+            "handshake": self.handshake.snapshot(),
+            "responses": {_pair_name(req_type, status): histogram.snapshot()
+                          for (req_type, status), histogram in self.responses.items()},
+        }
+
+
+def _pair_name(req_type: int, status: int) -> str:
+    from metadata import REQ_TYPES, STATUS_CODES
+
+    try:
+        req_name = REQ_TYPES(req_type).name
+    except ValueError:
+        req_name = str(req_type)
+
+    try:
+        status_name = STATUS_CODES(status).name
+    except ValueError:
+        status_name = str(status)
+
+    return req_name + "->" + status_name
+
+
+METRICS = Metrics()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def record_recv(received: int, seconds: float):
+    METRICS.recv_calls += 1
+    METRICS.bytes_in += received
+    METRICS.recv_blocked.record(seconds)
+
+
+def record_send(sent: int):
+    METRICS.send_calls += 1
+    METRICS.bytes_out += sent
+
+
+def record_response(req_type: int, status: int, seconds: float):
+    METRICS.response_histogram(req_type, status).record(seconds)
+
+
+def snapshot() -> dict:
+    return METRICS.snapshot()
+
+
+def dump(path: str = None):
+    """
+    Writes the metrics as JSON.
+
+    :param path: str file to write, stderr if None
+    :return: void
+    """
+    import json
+
+    report = json.dumps(snapshot(), indent=2, sort_keys=True)
+
+    if path is None:
+        print(report, file=sys.stderr)
+        return
+
+    with open(path, "w") as metrics_file:
+        metrics_file.write(report + "\n")
+
+
+def dump_on_exit(path: str = None):
+    """
+    Enables instrumentation, dumps it when the process exits and whenever it receives SIGUSR1.
+
+    :param path: str file to write, stderr if None
+    :return: void
+    """
+    import signal
+    import threading
+
+    enable()
+    atexit.register(dump, path)
+
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: dump(path))
@@ -0,0 +1,64 @@
+"""
+Handlers for the legacy tic-tac-toe protocols, versions 1 and 2.
+
+Each message is a single byte code. ttt_client registers this module with dispatch.register_module,
+so it is only imported when a game of either version is played.
+"""
+
+from constants import CODES, IDENTITIES, MESSAGES, TTT
+from dispatch import LEGACY_CODES, GameState, Protocol, decode_legacy, register
+from game_data import GameData, GameData_v2
+
+
+def _legacy_welcome(state: GameState, code: int):
+    game_data = state.game_data
+    game_data.process_welcome(state.s, MESSAGES[CODES["WELCOME"]])
+    print(game_data)
+
+    if game_data.get_identity() == IDENTITIES["X"]:
+        state.proposed_play = game_data.make_play(state.s, MESSAGES[CODES["INVITE"]])
+
+
+def _legacy_invite(state: GameState, code: int):
+    state.game_data.set_game_board(state.s)
+    state.game_data.print_board()
+
+    state.proposed_play = state.game_data.make_play(state.s, MESSAGES[CODES["INVITE"]])
+
+
+def _legacy_invalid(state: GameState, code: int):
+    print(MESSAGES[CODES["INVALID"]])
+    state.proposed_play = state.game_data.make_play(state.s, MESSAGES[CODES["INVITE"]])
+
+
+def _legacy_accepted(state: GameState, code: int):
+    print(MESSAGES[CODES["ACCEPTED"]])
+    try:
+        state.game_data.set_play(state.proposed_play)
+    except IndexError:
+        # I have not idea what's happening
+        pass
+
+    state.proposed_play = None
+
+    state.game_data.print_board()
+
+
+def _legacy_announce(state: GameState, code: int):
+    print(MESSAGES[code])
+
+
+LEGACY_HANDLERS = {
+    CODES["WELCOME"]: _legacy_welcome,
+    CODES["INVITE"]: _legacy_invite,
+    CODES["INVALID"]: _legacy_invalid,
+    CODES["ACCEPTED"]: _legacy_accepted,
+    CODES["WIN"]: _legacy_announce,
+    CODES["LOSE"]: _legacy_announce,
+    CODES["TIE"]: _legacy_announce,
+    CODES["DISCONNECT"]: _legacy_announce,
+}
+
+
+for legacy_version, legacy_game in ((1, GameData), (2, GameData_v2)):
+    register(TTT, legacy_version, Protocol(legacy_game, decode_legacy, LEGACY_CODES, LEGACY_HANDLERS))
@@ -0,0 +1,201 @@
+"""
+Load generator: plays N concurrent bot sessions against a server and reports throughput and latency.
+
+usage:
+    python3 ttt_client.py loadgen [--port p] [--connections n] [--concurrency c] [--policy engine|random]
+                                  [--timeout s] HOST
+    python3 rps_client.py loadgen [--port p] [--connections n] [--concurrency c] [--timeout s] HOST
+
+The server pairs the connections up, so n connections play n / 2 games. Both n and c must be
+even, or a session can be left waiting for an opponent that never connects; sessions that still
+do not finish within the timeout are counted as errors.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from async_client import SessionTimings, play_rps, play_ttt, run_sessions
+from engine import get_engine
+from protocol import DEFAULT_PORT
+from constants import PAPER, ROCK, SCISSORS, TTT
+
+DEFAULT_CONNECTIONS = 100
+
+# Seconds a session may take, from connecting to the end of its game
+DEFAULT_SESSION_TIMEOUT = 30.0
+
+
+async def random_ttt_move(game_data) -> str:
+    """
+    Picks a random open position.
+
+    :param game_data: GameData_a4
+    :return: str
+    """
+    board = game_data.get_game_board()
+
+    return str(random.choice([i for i in range(len(board)) if board[i] == 45]))
+
+
+async def engine_ttt_move(game_data) -> str:
+    """
+    Plays the engine's optimal move.
+
+    :param game_data: GameData_a4
+    :return: str
+    """
+    return str(get_engine().best_move(game_data.get_game_board()))
+
+
+async def random_rps_move(game_data) -> int:
+    """
+    Picks a random play.
+
+    :param game_data: GameData_rps
+    :return: int
+    """
+    return random.choice((ROCK, PAPER, SCISSORS))
+
+
+TTT_POLICIES = {
+    "engine": engine_ttt_move,
+    "random": random_ttt_move,
+}
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of already sorted samples.
+
+    :param samples: list sorted ascending
+    :param fraction: float between 0 and 1
+    :return: float, or None if there are no samples
+    """
+    if not samples:
+        return None
+
+    rank = max(math.ceil(fraction * len(samples)), 1)
+
+    return samples[rank - 1]
+
+
+def run_loadgen(host: str, port: int, game_id: int, connections: int, choose_move=None,
+                concurrency: int = None, timeout: float = DEFAULT_SESSION_TIMEOUT) -> dict:
+    """
+    Opens the connections, plays every session to completion and collects the results.
+
+    :param host: str
+    :param port: int
+    :param game_id: int GAMES value
+    :param connections: int number of sessions to open
+    :param choose_move: coroutine function for the move policy; the engine for TTT and random for RPS if None
+    :param concurrency: int maximum sessions in flight, all of them if None
+    :param timeout: float seconds each session may take before it is abandoned as an error, None for no limit
+    :return: dict report
+    :raises ValueError: if connections or concurrency is odd, so a session could never be paired
+    """
+    if connections % 2 or (concurrency is not None and (concurrency < 2 or concurrency % 2)):
+        raise ValueError("connections and concurrency must be even and at least 2: the server pairs sessions")
+
+    timings = [SessionTimings() for _ in range(connections)]
+
+    if game_id == TTT:
+        choose_move = choose_move or engine_ttt_move
+
+        def play(i: int):
+            return play_ttt(host, port, choose_move, timings=timings[i])
+    else:
+        choose_move = choose_move or random_rps_move
+
+        def play(i: int):
+            return play_rps(host, port, choose_move, timings=timings[i])
+
+    def session(i: int):
+        return asyncio.wait_for(play(i), timeout)
+
+    started = time.perf_counter()
+    results = asyncio.run(run_sessions(session, connections, concurrency))
+    elapsed = time.perf_counter() - started
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    timeouts = sum(isinstance(e, asyncio.TimeoutError) for e in errors)
+    completed = len(results) - len(errors)
+
+    connect = sorted(t.connect for t in timings if t.connect is not None)
+    moves = sorted(m for t in timings for m in t.moves)
+
+    return {
+        "connections": connections,
+        "completed": completed,
+        "errors": len(errors),
+        "timeouts": timeouts,
+        "elapsed": elapsed,
+        "games_per_sec": completed / 2 / elapsed if elapsed else 0.0,
+        "connect": {"p50": percentile(connect, 0.50), "p95": percentile(connect, 0.95),
+                    "p99": percentile(connect, 0.99)},
+        "move_rtt": {"p50": percentile(moves, 0.50), "p95": percentile(moves, 0.95),
+                     "p99": percentile(moves, 0.99), "count": len(moves)},
+    }
+
+
+def print_report(report: dict):
+    """
+    Prints a loadgen report.
+
+    :param report: dict from run_loadgen
+    :return: void
+    """
+    print("sessions:", report["completed"], "of", report["connections"], "completed,", report["errors"], "errors,",
+          report["timeouts"], "timed out")
+    print("elapsed: %.3f s, %.1f games/sec" % (report["elapsed"], report["games_per_sec"]))
+
+    for name in ("connect", "move_rtt"):
+        stats = report[name]
+        print(name + ":", " ".join("%s=%s" % (key, _format_ms(stats[key])) for key in ("p50", "p95", "p99")))
+
+
+def _format_ms(seconds) -> str:
+    if seconds is None:
+        return "n/a"
+
+    return "%.3fms" % (seconds * 1000)
+
+
+def create_arguments(prog: str) -> argparse:
+    parser = argparse.ArgumentParser(prog=prog + " loadgen")
+
+    parser.add_argument("host", help="server IP address")
+    parser.add_argument("--port", help="server port #. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help="number of bot sessions to open. Default = " + str(DEFAULT_CONNECTIONS))
+    parser.add_argument("--concurrency", type=int, help="maximum sessions in flight. Default = all of them")
+    parser.add_argument("--policy", choices=sorted(TTT_POLICIES), default="engine",
+                        help="tic-tac-toe move policy. Default = engine")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_SESSION_TIMEOUT,
+                        help="seconds a session may take before it counts as an error. Default = "
+                             + str(DEFAULT_SESSION_TIMEOUT))
+
+    return parser
+
+
+def main(game_id: int, prog: str, argv: list):
+    parser = create_arguments(prog)
+    args = parser.parse_args(argv)
+
+    if args.connections < 2 or args.connections % 2:
+        parser.error("--connections must be even: the server pairs sessions into games")
+
+    if args.concurrency is not None and (args.concurrency < 2 or args.concurrency % 2):
+        parser.error("--concurrency must be even and at least 2, or paired sessions can wait on each other forever")
+
+    try:
+        port = int(args.port)
+    except TypeError:
+        port = DEFAULT_PORT
+
+    choose_move = TTT_POLICIES[args.policy] if game_id == TTT else None
+
+    print_report(run_loadgen(args.host, port, game_id, args.connections, choose_move, args.concurrency,
+                             args.timeout))
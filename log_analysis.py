@@ -0,0 +1,384 @@
+"""
+Streaming analysis of replay logs written with --record.
+
+The logs are read as a generator pipeline, one record at a time:
+
+    read_logs -> games -> Report.add
+
+games() keeps state only for sessions that are mid-game and rebuilds each tic-tac-toe board
+through GameData_a4.update_board, the same transitions the client applies. At most LIVE_SESSIONS
+sessions are tracked; the least recently active one is evicted past that, so sessions cut off
+mid-game or never paired cannot make memory grow with the size of the logs.
+
+usage:
+    python3 log_analysis.py [--json] LOG [LOG ...]
+"""
+
+import argparse
+import json
+from collections import Counter, OrderedDict, deque
+from bitboard import BitBoard
+from game_data import GameData_a4
+from instrumentation import Histogram
+from replay_log import RECEIVED, SENT, read_log
+from constants import (ACTION_OUT_OF_TURN, CONFIRMATION, END_OF_GAME, GAME_ACTION, ID_X, INVALID_ACTION, MOVE_MADE,
+                       RPS, START_GAME, SUCCESS, TTT, UPDATE, WIN)
+
+_GAME_ERROR_CODES = frozenset((INVALID_ACTION, ACTION_OUT_OF_TURN))
+
+# Sessions tracked at once; the least recently active is evicted and its game reported as truncated
+LIVE_SESSIONS = 65536
+
+# Game ids of sessions between games, for connections that are reused for another game
+RETIRED_SESSIONS = 65536
+
+
+class GameSummary:
+    """
+    One game as seen by one recorded session.
+
+    opening is the first move on the board for tic-tac-toe, and the session's own play for
+    rock paper scissors. plays lists the tic-tac-toe moves in order as (identity, position).
+    move_times and rejections cover every game action the session sent during the game,
+    including rejected ones. truncated is set on an unfinished game whose session was evicted
+    to bound memory.
+    """
+    __slots__ = ('game_id', 'identity', 'outcome', 'quit', 'finished', 'truncated', 'opening', 'moves', 'plays',
+                 'move_times', 'rejections')
+
+    def __init__(self, game_id: int):
+        self.game_id = game_id
+        self.identity = None
+        self.outcome = None
+        self.quit = False
+        self.finished = False
+        self.truncated = False
+        self.opening = None
+        self.moves = 0
+        self.plays = []
+        self.move_times = []
+        self.rejections = Counter()
+
+
+class SessionState:
+    __slots__ = ('game_id', 'handshaking', 'game_data', 'pending', 'summary')
+
+    def __init__(self):
+        self.game_id = None
+        self.handshaking = False
+        self.game_data = None
+        self.pending = deque()
+        self.summary = None
+
+
+def read_logs(paths: list):
+    """
+    :param paths: list of str replay logs
+    :return: generator of replay_log.LogRecord, one log after another
+    """
+    for path in paths:
+        yield from read_log(path)
+
+
+def games(records):
+    """
+    Turns a stream of log records into a stream of finished games.
+
+    A game is yielded when its END_OF_GAME arrives or the session quits. Games still in
+    progress when the records run out are yielded last, with finished set to False. Past
+    LIVE_SESSIONS sessions, the least recently active one is dropped and its game, if it had
+    started one, is yielded unfinished with truncated set.
+
+    :param records: iterable of replay_log.LogRecord
+    :return: generator of GameSummary
+    """
+    sessions = OrderedDict()
+    retired = OrderedDict()
+
+    for record in records:
+        key = record.session_key()
+        state = sessions.get(key)
+
+        if state is None:
+            state = sessions[key] = SessionState()
+            state.game_id = retired.pop(key, None)
+
+            if len(sessions) > LIVE_SESSIONS:
+                _, evicted = sessions.popitem(last=False)
+
+                if evicted.summary is not None:
+                    evicted.summary.truncated = True
+                    yield evicted.summary
+        else:
+            sessions.move_to_end(key)
+
+        if record.kind == SENT:
+            if record.msg_type == CONFIRMATION:
+                state.game_id = record.payload[1]
+                state.handshaking = True
+            elif record.msg_type == GAME_ACTION:
+                state.pending.append((record.payload[0], record.timestamp))
+            else:
+                state.pending.append(('Q', record.timestamp))
+
+            continue
+
+        if record.kind != RECEIVED:
+            continue
+
+        if record.msg_type == UPDATE:
+            summary = _apply_update(state, record)
+        elif state.handshaking:
+            state.handshaking = False
+            summary = None
+        else:
+            summary = _apply_response(state, record)
+
+        if summary is not None:
+            if not state.pending:
+                # Between games: keep only the game id, in case the connection plays another
+                del sessions[key]
+                retired[key] = state.game_id
+
+                if len(retired) > RETIRED_SESSIONS:
+                    retired.popitem(last=False)
+
+            yield summary
+
+    for state in sessions.values():
+        if state.summary is not None:
+            yield state.summary
+
+
+def _apply_update(state: SessionState, record) -> GameSummary:
+    """
+    :return: GameSummary if the update ended the game
+    """
+    context = record.context
+
+    if context == START_GAME:
+        state.summary = GameSummary(state.game_id)
+        state.game_data = GameData_a4(BitBoard()) if state.game_id == TTT else None
+
+        if state.game_data is not None:
+            state.game_data.set_identity(record.payload[0])
+            state.summary.identity = state.game_data.get_identity()
+
+        return None
+
+    summary = state.summary
+    game_data = state.game_data
+
+    if summary is None:
+        return None
+
+    if context == MOVE_MADE and game_data is not None:
+        _play(summary, game_data, record.payload[0], game_data.get_adversary())
+    elif context == END_OF_GAME:
+        outcome = record.payload[0]
+
+        # As in the client: the closing play is only read, and was the adversary's, unless this
+        # player won; on a tie it may have been this player's own, already on the board
+        if game_data is not None and outcome != WIN and len(record.payload) > 1:
+            play = record.payload[1]
+
+            if game_data.check_if_spot_is_played(play):
+                _play(summary, game_data, play, game_data.get_adversary())
+
+        summary.outcome = outcome
+        summary.finished = True
+        state.summary = None
+        state.game_data = None
+
+        return summary
+
+    return None
+
+
+def _apply_response(state: SessionState, record) -> GameSummary:
+    """
+    :return: GameSummary if the response confirmed a quit
+    """
+    if not state.pending:
+        return None
+
+    play, sent_at = state.pending.popleft()
+    summary = state.summary
+
+    if summary is None:
+        return None
+
+    if play == 'Q':
+        if record.msg_type == SUCCESS:
+            summary.quit = True
+            summary.finished = True
+            state.summary = None
+            state.game_data = None
+            return summary
+
+        return None
+
+    summary.move_times.append((record.timestamp - sent_at) / 1000000)
+
+    if record.msg_type == SUCCESS:
+        if state.game_data is not None:
+            _play(summary, state.game_data, play, state.game_data.get_identity())
+        elif summary.opening is None:
+            summary.opening = play
+    elif record.msg_type in _GAME_ERROR_CODES:
+        summary.rejections[record.msg_type] += 1
+
+    return None
+
+
+def _play(summary: GameSummary, game_data: GameData_a4, position: int, identity: int):
+    if summary.moves == 0:
+        summary.opening = position
+
+    game_data.update_board(position, identity)
+    summary.plays.append((identity, position))
+    summary.moves += 1
+
+
+class Report:
+    """
+    Aggregates over a stream of games in constant memory.
+
+    Opening moves are counted from X's side only for tic-tac-toe, so a game recorded by both
+    players is not counted twice.
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.unfinished = 0
+        self.truncated = 0
+        self.quits = 0
+        self.outcomes = {game_id: Counter() for game_id in (TTT, RPS)}
+        self.openings = {game_id: Counter() for game_id in self.outcomes}
+        self.move_rtt = Histogram()
+        self.actions = 0
+        self.rejections = Counter()
+
+    def add(self, summary: GameSummary):
+        self.games += 1
+        self.actions += len(summary.move_times)
+        self.rejections.update(summary.rejections)
+
+        for move_time in summary.move_times:
+            self.move_rtt.record(move_time)
+
+        if not summary.finished:
+            self.unfinished += 1
+            self.truncated += summary.truncated
+            return
+
+        if summary.quit:
+            self.quits += 1
+
+        if summary.game_id not in self.outcomes:
+            return
+
+        if summary.outcome is not None:
+            self.outcomes[summary.game_id][summary.outcome] += 1
+
+        counts_opening = summary.game_id != TTT or summary.identity == ID_X
+
+        if summary.opening is not None and counts_opening:
+            self.openings[summary.game_id][summary.opening] += 1
+
+    def snapshot(self) -> dict:
+        # Only the report needs the names
+        from metadata import GAME_ERRORS, GAMES, OUTCOMES
+
+        return {
+            "games": self.games,
+            "unfinished": self.unfinished,
+            "truncated": self.truncated,
+            "quits": self.quits,
+            "outcomes": {GAMES(game_id).name: {OUTCOMES(outcome).name: count for outcome, count in counts.items()}
+                         for game_id, counts in self.outcomes.items() if counts},
+            "openings": {GAMES(game_id).name: {_opening_name(game_id, play): count
+                                               for play, count in counts.most_common()}
+                         for game_id, counts in self.openings.items() if counts},
+            "move_rtt": self.move_rtt.snapshot(),
+            "game_actions": self.actions,
+            "illegal_move_rates": {error.name: self.rejections[error.value] / self.actions if self.actions else 0.0
+                                   for error in GAME_ERRORS},
+        }
+
+
+def _opening_name(game_id: int, play: int) -> str:
+    if game_id == TTT:
+        return str(play)
+
+    from metadata import RPS_PLAYS
+
+    try:
+        return RPS_PLAYS(play).name
+    except ValueError:
+        return str(play)
+
+
+def analyze(paths: list) -> Report:
+    """
+    Reads replay logs in a single pass.
+
+    :param paths: list of str replay logs
+    :return: Report
+    """
+    report = Report()
+
+    for summary in games(read_logs(paths)):
+        report.add(summary)
+
+    return report
+
+
+def print_report(report: Report):
+    snapshot = report.snapshot()
+
+    print("games: %d (%d unfinished, %d truncated, %d quit)" % (snapshot["games"], snapshot["unfinished"],
+                                                                 snapshot["truncated"], snapshot["quits"]))
+
+    for game, outcomes in snapshot["outcomes"].items():
+        print(game, "outcomes:", ", ".join("%s=%d" % item for item in sorted(outcomes.items())))
+
+    for game, openings in snapshot["openings"].items():
+        print(game, "openings:", ", ".join("%s=%d" % item for item in openings.items()))
+
+    move_rtt = snapshot["move_rtt"]
+    print("move_rtt:", " ".join("%s=%s" % (key, _format_ms(move_rtt[key])) for key in ("p50", "p95", "p99")))
+
+    print("illegal moves: %s of %d game actions" % (
+        ", ".join("%s=%.2f%%" % (name, rate * 100) for name, rate in snapshot["illegal_move_rates"].items()),
+        snapshot["game_actions"]))
+
+
+def _format_ms(seconds) -> str:
+    if seconds is None:
+        return "n/a"
+
+    return "<=%.3fms" % (seconds * 1000)
+
+
+def create_arguments() -> argparse:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("logs", nargs="+", metavar="LOG", help="replay logs written with --record")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    return parser
+
+
+def main():
+    args = create_arguments().parse_args()
+    report = analyze(args.logs)
+
+    if args.json:
+        print(json.dumps(report.snapshot(), indent=2, sort_keys=True))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,46 @@
-import enum
+"""
+The protocol's values as enums, for code that wants names. The hot path uses the plain
+integers in constants.py, which these are built from.
+"""
 
-ENDIANNESS = 'little'
-
-CODES = {
-    "WELCOME": 1,
-    "INVITE": 4,
-    "INVALID": 5,
-    "ACCEPTED": 6,
-    "WIN": 7,
-    "LOSE": 8,
-    "TIE": 9,
-    "DISCONNECT": 10,
-    "VERSION": 11
-}
-
-MESSAGES = {
-    1: "Welcome",
-    4: "Your turn! What is your move?",
-    5: "Invalid move. Try again",
-    6: "Move accepted",
-    7: "You win!",
-    8: "You lose!",
-    9: "Tie game",
-    88: "You are X",
-    79: "You are O",
-    11: "Version number",
-    10: "Opponent has disconnected. Please stand by."
-}
-
-IDENTITIES = {
-    "X": 88,
-    "O": 79,
-    "x": 88,
-    "o": 79
-}
+import enum
+import constants
+from constants import CODES, ENDIANNESS, EOF_MESSAGES, IDENTITIES, MESSAGES, RESPONSE_MESSAGES, STATUS_MESSAGES
 
 
 class IDs(enum.Enum):
-    X = 88
-    O = 79
+    X = constants.ID_X
+    O = constants.ID_O
     x = X
     o = O
 
 
 class STATUS_CODES(enum.Enum):
-    SUCCESS = 10
-    UPDATE = 20
-    CLIENT_INVALID_REQUEST = 30
-    CLIENT_INVALID_UID = 31
-    CLIENT_INVALID_TYPE = 32
-    CLIENT_INVALID_CONTEXT = 33
-    CLIENT_INVALID_PAYLOAD = 34
-    SERVER_ERROR = 40
-    INVALID_ACTION = 50
-    ACTION_OUT_OF_TURN = 51
+    SUCCESS = constants.SUCCESS
+    UPDATE = constants.UPDATE
+    CLIENT_INVALID_REQUEST = constants.CLIENT_INVALID_REQUEST
+    CLIENT_INVALID_UID = constants.CLIENT_INVALID_UID
+    CLIENT_INVALID_TYPE = constants.CLIENT_INVALID_TYPE
+    CLIENT_INVALID_CONTEXT = constants.CLIENT_INVALID_CONTEXT
+    CLIENT_INVALID_PAYLOAD = constants.CLIENT_INVALID_PAYLOAD
+    SERVER_ERROR = constants.SERVER_ERROR
+    INVALID_ACTION = constants.INVALID_ACTION
+    ACTION_OUT_OF_TURN = constants.ACTION_OUT_OF_TURN
 
 
 class REQ_TYPES(enum.Enum):
-    CONFIRMATION = 1
-    INFORMATION = 2
-    META_ACTION = 3
-    GAME_ACTION = 4
+    CONFIRMATION = constants.CONFIRMATION
+    INFORMATION = constants.INFORMATION
+    META_ACTION = constants.META_ACTION
+    GAME_ACTION = constants.GAME_ACTION
 
 
 class CLIENT_ERRORS(enum.Enum):
-    INVALID_REQUEST = 30
-    INVALID_UID = 31
-    INVALID_TYPE = 32
-    INVALID_CONTEXT = 33
-    INVALID_PAYLOAD = 34
+    INVALID_REQUEST = constants.CLIENT_INVALID_REQUEST
+    INVALID_UID = constants.CLIENT_INVALID_UID
+    INVALID_TYPE = constants.CLIENT_INVALID_TYPE
+    INVALID_CONTEXT = constants.CLIENT_INVALID_CONTEXT
+    INVALID_PAYLOAD = constants.CLIENT_INVALID_PAYLOAD
 
 
 class CLIENT_ERROR_MSGS(enum.Enum):
@@ -80,8 +52,8 @@ class CLIENT_ERROR_MSGS(enum.Enum):
 
 
 class GAME_ERRORS(enum.Enum):
-    INVALID_ACTION = 50
-    ACTION_OUT_OF_TURN = 51
+    INVALID_ACTION = constants.INVALID_ACTION
+    ACTION_OUT_OF_TURN = constants.ACTION_OUT_OF_TURN
 
 
 class GAME_ERROR_MSGS(enum.Enum):
@@ -89,39 +61,33 @@ class GAME_ERROR_MSGS(enum.Enum):
     ACTION_OUT_OF_TURN = "Not your turn"
 
 
-RESPONSE_MESSAGES = {
-    CLIENT_ERRORS.INVALID_REQUEST.value: "Invalid request",
-    CLIENT_ERRORS.INVALID_UID.value: "Invalid uid supplied",
-    CLIENT_ERRORS.INVALID_TYPE.value: "Invalid msg_type",
-    CLIENT_ERRORS.INVALID_CONTEXT.value: "Invalid context supplied",
-    CLIENT_ERRORS.INVALID_PAYLOAD.value: "Invalid payload supplied",
-    GAME_ERRORS.INVALID_ACTION.value: "Invalid play",
-    GAME_ERRORS.ACTION_OUT_OF_TURN.value: "Not your turn",
-}
-
-
 class REQ_CONTEXTS(enum.Enum):
-    CONFIRM_RULESET = 1
-    MAKE_MOVE = 1
-    QUIT = 1
+    CONFIRM_RULESET = constants.CONFIRM_RULESET
+    MAKE_MOVE = constants.MAKE_MOVE
+    QUIT = constants.QUIT
 
 
 class UPD_CONTEXTS(enum.Enum):
-    START_GAME = 1
-    MOVE_MADE = 2
-    END_OF_GAME = 3
+    START_GAME = constants.START_GAME
+    MOVE_MADE = constants.MOVE_MADE
+    END_OF_GAME = constants.END_OF_GAME
 
 
 class OUTCOMES(enum.Enum):
-    WIN = 1
-    LOSS = 2
-    TIE = 3
+    WIN = constants.WIN
+    LOSS = constants.LOSS
+    TIE = constants.TIE
+
+
+class GAMES(enum.Enum):
+    TTT = constants.TTT
+    RPS = constants.RPS
 
 
 class RPS_PLAYS(enum.Enum):
-    ROCK = 1
-    PAPER = 2
-    SCISSORS = 3
+    ROCK = constants.ROCK
+    PAPER = constants.PAPER
+    SCISSORS = constants.SCISSORS
 
 
 # class EOF_MESSAGES(enum.Enum):
@@ -129,19 +95,4 @@ class RPS_PLAYS(enum.Enum):
 #     OUTCOMES.LOSS = " lose!"
 #     OUTCOMES.TIE = " tie!"
 
-EOF_MESSAGES = {
-    OUTCOMES.WIN.value: " win!",
-    OUTCOMES.LOSS.value: "lose!",
-    OUTCOMES.TIE.value: " tie!"
-}
-
-STATUS_MESSAGES = {
-    10: "success",
-    20: "update",
-    30: "invalid_type",
-    31: "invalid context",
-    32: "invalid payload",
-    40: "server error",
-    50: "invalid action",
-    51: "action out of turn"
-}
+
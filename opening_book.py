@@ -0,0 +1,258 @@
+"""
+Opening book: the first moves of a game, precomputed.
+
+The book holds a move for every position up to a few plies deep, keyed by the position's
+canonical form under the 8 board symmetries (engine.canonicalize), so each family of
+symmetric positions is stored once. Loading expands it into a dict from every image of
+those positions, as the 9 bytes of GameData's board, to the move, so answering a book
+position is one dictionary hit with no search and no canonicalization.
+
+Only building a book needs the engine; loading one does not import it.
+
+The file is a short header followed by one entry per canonical position: its key, as
+engine.canonicalize computes it, and the move in that canonical frame.
+
+usage:
+    python3 opening_book.py [--plies n] [--logs LOG ...] PATH
+"""
+
+import operator
+import os
+from struct import Struct
+from bitboard import BitBoard, BOARD_SIZE, FULL_MASK, INVERSE_SYMMETRIES, SYMMETRIES, WINNING_MASKS, X, O
+from constants import LOSS, TIE, TTT, WIN
+
+MAGIC = b"TTTB"
+BOOK_VERSION = 1
+BOOK_HEADER = Struct("<4sHH")  # magic, version, plies
+BOOK_ENTRY = Struct("<LB")  # canonical key, move in the canonical frame
+
+# Positions with at most this many moves on the board are in the book by default
+DEFAULT_PLIES = 3
+
+# _IMAGES[s](cells) is the board cells turn into under symmetry s, as a tuple of ordinals
+_IMAGES = tuple(operator.itemgetter(*inverse) for inverse in INVERSE_SYMMETRIES)
+
+# What a game's outcome is worth to the player whose move is being scored
+OUTCOME_SCORES = {WIN: 1, TIE: 0, LOSS: -1}
+
+
+class OpeningBook:
+    """
+    Book moves for the positions up to plies moves deep.
+    """
+
+    def __init__(self, entries: dict, plies: int = DEFAULT_PLIES):
+        """
+        :param entries: dict of canonical key to the move in the canonical frame
+        :param plies: int most moves on the board of any position in the book
+        """
+        self.__entries = entries
+        self.__plies = plies
+        self.__moves = {}
+
+        for key, move in entries.items():
+            cells = bytes(BitBoard(key & FULL_MASK, key >> BOARD_SIZE))
+
+            for symmetry, image in zip(SYMMETRIES, _IMAGES):
+                self.__moves[bytes(image(cells))] = symmetry[move]
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_entries(self) -> dict:
+        return self.__entries
+
+    def get_plies(self) -> int:
+        return self.__plies
+
+    def best_move(self, board) -> int:
+        """
+        Gets the book move for a position.
+
+        :param board: bytearray, bytes or other sequence of 9 ASCII ordinals, e.g. a BitBoard
+        :return: int position, or None if the position is not in the book
+        """
+        return self.__moves.get(bytes(board))
+
+
+def build_book(engine=None, plies: int = DEFAULT_PLIES) -> OpeningBook:
+    """
+    Takes the engine's best move for every position up to plies moves deep.
+
+    :param engine: anything with best_move(board), e.g. engine.Engine or engine_table.MappedEngine;
+                   the shared engine if None
+    :param plies: int
+    :return: OpeningBook
+    """
+    from engine import POPCOUNT, canonicalize, get_engine
+
+    if engine is None:
+        engine = get_engine()
+
+    entries = {}
+    frontier = {canonicalize(0, 0)[0]}
+
+    for _ in range(plies + 1):
+        following = set()
+
+        for key in frontier:
+            x_mask = key & FULL_MASK
+            o_mask = key >> BOARD_SIZE
+            occupied = x_mask | o_mask
+
+            if WINNING_MASKS[x_mask] or WINNING_MASKS[o_mask] or occupied == FULL_MASK:
+                continue
+
+            # The canonical board itself is asked for, so the move is already in its frame
+            entries[key] = engine.best_move(BitBoard(x_mask, o_mask))
+
+            for position in range(BOARD_SIZE):
+                bit = 1 << position
+
+                if occupied & bit:
+                    continue
+
+                if POPCOUNT[x_mask] == POPCOUNT[o_mask]:
+                    following.add(canonicalize(x_mask | bit, o_mask)[0])
+                else:
+                    following.add(canonicalize(x_mask, o_mask | bit)[0])
+
+        frontier = following
+
+    return OpeningBook(entries, plies)
+
+
+def build_book_from_games(games, plies: int = DEFAULT_PLIES) -> OpeningBook:
+    """
+    Takes, for every position up to plies moves deep, the move that scored best for the
+    players who made it in recorded games.
+
+    Each move counts once, from the recording of the player who made it, for 1 on a win,
+    0 on a tie and -1 on a loss. The move with the best average wins, and on equal averages
+    the one played most.
+
+    :param games: iterable of log_analysis.GameSummary, e.g. from log_analysis.games
+    :param plies: int
+    :return: OpeningBook
+    """
+    from engine import POPCOUNT, canonicalize
+
+    scores = {}
+
+    for summary in games:
+        score = OUTCOME_SCORES.get(summary.outcome)
+
+        if summary.game_id != TTT or not summary.finished or score is None:
+            continue
+
+        x_mask = 0
+        o_mask = 0
+
+        for identity, position in summary.plays:
+            if POPCOUNT[x_mask | o_mask] > plies:
+                break
+
+            if identity == summary.identity:
+                key, symmetry = canonicalize(x_mask, o_mask)
+                moves = scores.setdefault(key, {})
+                move = SYMMETRIES[symmetry][position]
+                total, count = moves.get(move, (0, 0))
+                moves[move] = (total + score, count + 1)
+
+            if identity == X:
+                x_mask |= 1 << position
+            elif identity == O:
+                o_mask |= 1 << position
+
+    entries = {}
+
+    for key, moves in scores.items():
+        entries[key] = max(moves, key=lambda move: (moves[move][0] / moves[move][1], moves[move][1]))
+
+    return OpeningBook(entries, plies)
+
+
+def write_book(path: str, book: OpeningBook):
+    """
+    Serializes a book.
+
+    Written to a temporary file and renamed into place, so concurrent workers never load a
+    half-written book.
+
+    :param path: str
+    :param book: OpeningBook
+    :return: void
+    """
+    temporary_path = path + ".tmp" + str(os.getpid())
+
+    with open(temporary_path, "wb") as book_file:
+        book_file.write(BOOK_HEADER.pack(MAGIC, BOOK_VERSION, book.get_plies()))
+        book_file.write(b"".join(BOOK_ENTRY.pack(key, move) for key, move in sorted(book.get_entries().items())))
+
+    os.replace(temporary_path, path)
+
+
+def read_book(path: str) -> OpeningBook:
+    """
+    :param path: str book written by write_book
+    :return: OpeningBook
+    """
+    with open(path, "rb") as book_file:
+        data = book_file.read()
+
+    if len(data) < BOOK_HEADER.size or (len(data) - BOOK_HEADER.size) % BOOK_ENTRY.size:
+        raise ValueError("opening book has the wrong size: " + path)
+
+    magic, version, plies = BOOK_HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != BOOK_VERSION:
+        raise ValueError("not an opening book, or an unsupported version: " + path)
+
+    return OpeningBook(dict(BOOK_ENTRY.iter_unpack(data[BOOK_HEADER.size:])), plies)
+
+
+def open_book(path: str) -> OpeningBook:
+    """
+    Loads an opening book, building it from the engine and writing it first if the file does
+    not exist yet.
+
+    :param path: str
+    :return: OpeningBook
+    """
+    if not os.path.exists(path):
+        write_book(path, build_book())
+
+    return read_book(path)
+
+
+def create_arguments():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("path", help="book file to write")
+    parser.add_argument("--plies", type=int, default=DEFAULT_PLIES,
+                        help="book every position with up to this many moves on the board. Default = "
+                             + str(DEFAULT_PLIES))
+    parser.add_argument("--logs", nargs="+", metavar="LOG",
+                        help="build the book from the games in these replay logs instead of the engine")
+
+    return parser
+
+
+def main():
+    args = create_arguments().parse_args()
+
+    if args.logs:
+        from log_analysis import games, read_logs
+        book = build_book_from_games(games(read_logs(args.logs)), args.plies)
+    else:
+        book = build_book(plies=args.plies)
+
+    write_book(args.path, book)
+    print("%d positions up to %d plies written to %s" % (len(book), book.get_plies(), args.path))
+
+
+if __name__ == "__main__":
+    main()
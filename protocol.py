@@ -1,28 +1,218 @@
+import select
 import socket
-from metadata import *
+import time
+import weakref
+import instrumentation
+import replay_log
+from codec import HEADER, Message, pack_handshake
+from errors import ConnectionClosedError, ReadTimeoutError, error_for_status
+from constants import ENDIANNESS, SUCCESS
 
 DEFAULT_PORT = 2034
+HEADER_LENGTH = HEADER.size
+RECV_BUFFER_SIZE = 4096
 
+# Seconds each message may take to arrive in full, for readers created from now on; None waits forever
+read_timeout = None
 
-def get_message(s: socket) -> dict:
+
+def set_read_timeout(seconds: float):
     f"""
-    Gets a message from the server.
+    Sets the per-message deadline for connections read from now on.
+
+    :param seconds: {float} or None to wait indefinitely
+    :return: {None}
+    """
+    global read_timeout
+    read_timeout = seconds
+
+
+class FrameReader:
+    """
+    Per-connection receive buffer.
+
+    Fills itself with large recv_into calls and hands out exact byte counts, so a whole
+    [msg_type, context, payload_length, payload...] frame costs one syscall instead of 3 + N.
+
+    Every read returns exactly the bytes asked for or raises: ConnectionClosedError if the
+    server hangs up first, ReadTimeoutError if a timeout is set and the whole message has not
+    arrived within it.
+    """
+
+    def __init__(self, s: socket, buffer_size: int = RECV_BUFFER_SIZE, timeout: float = None):
+        self.__socket = s
+        self.__buffer = bytearray(buffer_size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0
+        self.__end = 0
+        self.__timeout = None
+        self.__poll = None
+        self.set_timeout(timeout)
+
+    def buffered(self) -> int:
+        return self.__end - self.__start
+
+    def set_timeout(self, seconds: float):
+        """
+        :param seconds: float each read_frame / read_exact call may take, None to wait indefinitely
+        :return: void
+        """
+        self.__timeout = seconds
+
+        if seconds is not None and self.__poll is None and hasattr(select, "poll"):
+            self.__poll = select.poll()
+            self.__poll.register(self.__socket, select.POLLIN)
+
+    def get_timeout(self) -> float:
+        return self.__timeout
+
+    def __wait_readable(self, deadline: float):
+        remaining = deadline - time.monotonic()
+
+        if remaining > 0:
+            if self.__poll is not None:
+                ready = self.__poll.poll(remaining * 1000)
+            else:
+                ready = select.select((self.__socket,), (), (), remaining)[0]
+
+            if ready:
+                return
+
+        raise ReadTimeoutError("No complete message from the server within %.3f s" % self.__timeout)
+
+    def __deadline(self) -> float:
+        return time.monotonic() + self.__timeout if self.__timeout is not None else None
+
+    def __fill(self, needed: int, deadline: float = None):
+        """
+        Receives from the socket until at least needed bytes are buffered.
+
+        :param needed: int
+        :param deadline: float time.monotonic() value to give up at, None to wait indefinitely
+        :return: void
+        """
+
+        if self.__start + needed > len(self.__buffer):
+            # Move the unread bytes to the front; grow if a single read does not fit
+            pending = self.__end - self.__start
+
+            if needed > len(self.__buffer):
+                new_buffer = bytearray(max(needed, 2 * len(self.__buffer)))
+                new_buffer[:pending] = self.__view[self.__start:self.__end]
+                self.__view.release()
+                self.__buffer = new_buffer
+                self.__view = memoryview(self.__buffer)
+            else:
+                self.__view[:pending] = self.__view[self.__start:self.__end]
+
+            self.__start = 0
+            self.__end = pending
+
+        while self.__end - self.__start < needed:
+            if deadline is not None:
+                self.__wait_readable(deadline)
+
+            try:
+                if instrumentation.enabled:
+                    started = time.perf_counter()
+                    received = self.__socket.recv_into(self.__view[self.__end:])
+                    instrumentation.record_recv(received, time.perf_counter() - started)
+                else:
+                    received = self.__socket.recv_into(self.__view[self.__end:])
+            except ConnectionResetError as e:
+                raise ConnectionClosedError("Server reset the connection") from e
+
+            if received == 0:
+                if self.__end == self.__start:
+                    raise ConnectionClosedError("Server closed the connection")
+
+                raise ConnectionClosedError("Server closed the connection %d bytes into a %d byte read"
+                                            % (self.__end - self.__start, needed))
+
+            self.__end += received
+
+    def read_exact(self, count: int) -> bytes:
+        """
+        Reads exactly count bytes from the connection.
+
+        :param count: int
+        :return: bytes
+        """
+        if self.__end - self.__start < count:
+            self.__fill(count, self.__deadline())
+
+        start = self.__start
+        self.__start += count
+
+        return bytes(self.__view[start:self.__start])
+
+    def read_frame(self) -> tuple:
+        """
+        Reads one complete server frame.
+
+        :return: tuple of (msg_type, context, payload bytes)
+        """
+        deadline = None
+
+        if self.__end - self.__start < HEADER_LENGTH:
+            # One deadline covers the header and the payload
+            deadline = self.__deadline()
+            self.__fill(HEADER_LENGTH, deadline)
+
+        start = self.__start
+        msg_type = self.__buffer[start]
+        context = self.__buffer[start + 1]
+        payload_length = self.__buffer[start + 2]
+
+        if self.__end - start < HEADER_LENGTH + payload_length:
+            if deadline is None:
+                deadline = self.__deadline()
+
+            self.__fill(HEADER_LENGTH + payload_length, deadline)
+            start = self.__start
+
+        payload_start = start + HEADER_LENGTH
+        self.__start = payload_start + payload_length
+        payload = bytes(self.__view[payload_start:self.__start])
+
+        if replay_log.recorder is not None:
+            replay_log.recorder.record_received(self.__socket, msg_type, context, payload)
+
+        return msg_type, context, payload
+
+
+_readers = weakref.WeakKeyDictionary()
+
+
+def get_reader(s: socket) -> FrameReader:
+    f"""
+    Gets the receive buffer attached to a connection, creating it on first use.
 
     :param s: {socket} TCP socket
-    :return: {dict} the header and payload data
+    :return: {FrameReader}
     """
-    header = get_header(s)
+    reader = _readers.get(s)
+
+    if reader is None:
+        reader = FrameReader(s, timeout=read_timeout)
+        _readers[s] = reader
 
-    payload_length = header["payload_length"]
+    return reader
 
-    if payload_length != 0:
-        payload = get_payload(s, header)
-    else:
-        payload = {"payload": None}
 
-    message = {'header': header, 'payload': payload}
+def get_message(s: socket) -> Message:
+    f"""
+    Gets a message from the server.
+
+    :param s: {socket} TCP socket
+    :return: {Message} the header fields and payload bytes
+    """
+    msg_type, context, payload = get_reader(s).read_frame()
+
+    if instrumentation.enabled:
+        instrumentation.METRICS.messages_in += 1
 
-    return message
+    return Message(msg_type, context, payload)
 
 
 def get_header(s: socket) -> dict:
@@ -32,9 +222,7 @@ def get_header(s: socket) -> dict:
     :param s: {socket} TCP socket
     :return: {dict} details of the packet header
     """
-    msg_type = int.from_bytes(s.recv(1), 'big')
-    msg_context = int.from_bytes(s.recv(1), 'big')
-    payload_length = int.from_bytes(s.recv(1), 'big')
+    msg_type, msg_context, payload_length = get_reader(s).read_exact(HEADER_LENGTH)
 
     header = {"msg_type": msg_type, "context": msg_context, "payload_length": payload_length}
 
@@ -50,12 +238,7 @@ def get_payload(s: socket, header: dict) -> list:
     :return: {list} the payload message
     """
 
-    payload = []
-
-    for i in range(0, header['payload_length']):
-        payload.append(int.from_bytes(s.recv(1), 'big'))
-
-    return payload
+    return list(get_reader(s).read_exact(header['payload_length']))
 
 
 def handshake(s: socket, game_id: int) -> int:
@@ -66,40 +249,46 @@ def handshake(s: socket, game_id: int) -> int:
     :param s: {socket}  
     :return: {int} uid of player
     """
-    # Start with 4 'empty' bytes
-    empty_byte = 0
-    confirmation = 1
-    rule_set = 1
-    payload_length = 2
-    protocol_version = 1
-
-    packet = [empty_byte, empty_byte, empty_byte, empty_byte, confirmation, rule_set, payload_length,
-              protocol_version, game_id]
-
-    s.sendall(bytes(packet))
+    started = time.perf_counter()
+    send_packet(s, pack_handshake(game_id))
 
     uid = get_uid(s)
 
+    if instrumentation.enabled:
+        instrumentation.METRICS.handshake.record(time.perf_counter() - started)
+
     return uid
 
 
+def send_packet(s: socket, packet) -> None:
+    f"""
+    Sends a whole packet, counting it when instrumentation is on and logging it when recording.
+
+    :param s: {socket} TCP socket
+    :param packet: {bytes} or memoryview
+    :return: {None}
+    """
+    s.sendall(packet)
+
+    if instrumentation.enabled:
+        instrumentation.record_send(len(packet))
+
+    if replay_log.recorder is not None:
+        replay_log.recorder.record_sent(s, packet)
+
+
 def get_uid(s: socket) -> int:
     f"""
     Gets the player's uid from the server.
 
     :param s: {socket} TCP socket connection 
     :return: {int}
+    :raises StatusError: if the server refused the handshake
     """
 
-    # header = s.recv(2)  # Will this receive into a list of 2?
-    msg_type = int.from_bytes(s.recv(1), 'big')
-    msg_context = int.from_bytes(s.recv(1), 'big')
-    payload_length = int.from_bytes(s.recv(1), 'big')
-    uid = int.from_bytes(s.recv(payload_length), ENDIANNESS)
+    msg_type, msg_context, payload = get_reader(s).read_frame()
 
-    if msg_type == 32:
-        msg_code = uid
-        print(STATUS_MESSAGES[msg_code])
-        exit(1)
+    if msg_type != SUCCESS:
+        raise error_for_status(msg_type)
 
-    return uid
+    return int.from_bytes(payload, ENDIANNESS)
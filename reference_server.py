@@ -0,0 +1,392 @@
+"""
+Local stand-in for the a4 / RPS game server, for benchmarks and offline testing.
+
+Implements the server side of protocol.handshake, START_GAME identity assignment, MOVE_MADE
+and END_OF_GAME updates, and the SUCCESS / error responses the clients' take_turn expects.
+Players are matched first come, first served per game id.
+
+usage:
+    python3 reference_server.py [--host h] [--port p] [--rematch] [--stats-interval s]
+"""
+
+import abc
+import argparse
+import asyncio
+import itertools
+import time
+from collections import deque
+from bitboard import BitBoard, FULL_MASK, X, O
+from codec import HEADER, META_REQUEST, UID_PAYLOAD
+from protocol import DEFAULT_PORT
+from constants import (ACTION_OUT_OF_TURN, CLIENT_INVALID_PAYLOAD, CLIENT_INVALID_REQUEST, CLIENT_INVALID_TYPE,
+                       CLIENT_INVALID_UID, CONFIRMATION, END_OF_GAME, GAME_ACTION, INVALID_ACTION, LOSS, MAKE_MOVE,
+                       META_ACTION, MOVE_MADE, PAPER, QUIT, ROCK, RPS, SCISSORS, START_GAME, SUCCESS, TIE, TTT, UPDATE,
+                       WIN)
+
+IDENTITY_CODES = {X: 1, O: 2}
+
+# RPS_BEATS[a] is the play that a beats
+RPS_BEATS = {
+    ROCK: SCISSORS,
+    PAPER: ROCK,
+    SCISSORS: PAPER,
+}
+
+
+def pack_response(msg_type: int, context: int, payload: bytes = b'') -> bytes:
+    return HEADER.pack(msg_type, context, len(payload)) + payload
+
+
+class Player:
+    __slots__ = ('uid', 'game_id', 'writer', 'game', 'identity', 'queued_at')
+
+    def __init__(self, uid: int, game_id: int, writer: asyncio.StreamWriter):
+        self.uid = uid
+        self.game_id = game_id
+        self.writer = writer
+        self.game = None
+        self.identity = None
+        self.queued_at = None
+
+    def send(self, msg_type: int, context: int, payload: bytes = b''):
+        if not self.writer.is_closing():
+            self.writer.write(pack_response(msg_type, context, payload))
+
+    async def drain(self):
+        """
+        Waits until the client has taken what was sent to it, so a slow reader holds back its own
+        game instead of growing the server's buffers.
+        """
+        if not self.writer.is_closing():
+            try:
+                await self.writer.drain()
+            except ConnectionError:
+                pass
+
+    def respond(self, status: int):
+        self.send(status, MAKE_MOVE)
+
+    def end_game(self, outcome: int, play: int):
+        self.send(UPDATE, END_OF_GAME, bytes((outcome, play)))
+
+
+class Game(abc.ABC):
+    """
+    Base for one match between two players.
+    """
+
+    def __init__(self, server, players: tuple):
+        self.server = server
+        self.players = players
+        self.finished = False
+
+        for player, identity in zip(players, (X, O)):
+            player.game = self
+            player.identity = identity
+            player.send(UPDATE, START_GAME, bytes((IDENTITY_CODES[identity],)))
+
+    def opponent(self, player: Player) -> Player:
+        return self.players[1] if player is self.players[0] else self.players[0]
+
+    def quit(self, player: Player):
+        player.respond(SUCCESS)
+        self.forfeit(player)
+
+    def forfeit(self, player: Player):
+        """
+        Ends the game in the opponent's favour, e.g. on a quit or a disconnect.
+        """
+        if not self.finished:
+            self.opponent(player).end_game(WIN, 0)
+            self.finish()
+
+    def finish(self):
+        self.finished = True
+        self.server.game_finished(self)
+
+    @abc.abstractmethod
+    def play(self, player: Player, play: int):
+        """
+        Applies a player's GAME_ACTION and sends the response and any updates.
+        """
+
+
+class TicTacToeGame(Game):
+
+    def __init__(self, server, players: tuple):
+        super().__init__(server, players)
+        self.board = BitBoard()
+        self.turn = players[0]
+
+    def play(self, player: Player, play: int):
+        if player is not self.turn:
+            player.respond(ACTION_OUT_OF_TURN)
+            return
+
+        if not 0 <= play <= 8 or self.board.is_occupied(play):
+            player.respond(INVALID_ACTION)
+            return
+
+        self.board[play] = player.identity
+        player.respond(SUCCESS)
+
+        opponent = self.opponent(player)
+
+        if self.board.winner() is not None:
+            player.end_game(WIN, play)
+            opponent.end_game(LOSS, play)
+            self.finish()
+        elif (self.board.x_mask | self.board.o_mask) == FULL_MASK:
+            player.end_game(TIE, play)
+            opponent.end_game(TIE, play)
+            self.finish()
+        else:
+            opponent.send(UPDATE, MOVE_MADE, bytes((play,)))
+            self.turn = opponent
+
+
+class RockPaperScissorsGame(Game):
+
+    def __init__(self, server, players: tuple):
+        super().__init__(server, players)
+        self.plays = {}
+
+    def play(self, player: Player, play: int):
+        if player in self.plays:
+            player.respond(ACTION_OUT_OF_TURN)
+            return
+
+        if play not in RPS_BEATS:
+            player.respond(INVALID_ACTION)
+            return
+
+        self.plays[player] = play
+        player.respond(SUCCESS)
+
+        if len(self.plays) < 2:
+            return
+
+        first, second = self.players
+        first_play, second_play = self.plays[first], self.plays[second]
+
+        if first_play == second_play:
+            first.end_game(TIE, second_play)
+            second.end_game(TIE, first_play)
+        elif RPS_BEATS[first_play] == second_play:
+            first.end_game(WIN, second_play)
+            second.end_game(LOSS, first_play)
+        else:
+            first.end_game(LOSS, second_play)
+            second.end_game(WIN, first_play)
+
+        self.finish()
+
+
+GAME_TYPES = {
+    TTT: TicTacToeGame,
+    RPS: RockPaperScissorsGame,
+}
+
+
+class ServerStats:
+    __slots__ = ('connections', 'games_started', 'games_finished', 'match_wait_total', 'started')
+
+    def __init__(self):
+        self.connections = 0
+        self.games_started = 0
+        self.games_finished = 0
+        self.match_wait_total = 0.0
+        self.started = time.perf_counter()
+
+
+class ReferenceServer:
+
+    def __init__(self, rematch: bool = False):
+        """
+        :param rematch: bool keep connections open after END_OF_GAME and queue both players for another
+                        game, instead of closing them
+        """
+        self.rematch = rematch
+        self.stats = ServerStats()
+        self.__uids = itertools.count(1)
+        self.__waiting = {game_id: deque() for game_id in GAME_TYPES}
+        self.__server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        """
+        Starts listening; port 0 picks a free port, see get_port.
+
+        :return: void
+        """
+        self.__server = await asyncio.start_server(self.__handle_connection, host, port)
+
+    def get_port(self) -> int:
+        return self.__server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.__server.serve_forever()
+
+    def close(self):
+        self.__server.close()
+
+    def __enqueue(self, player: Player):
+        """
+        Queues a player for matchmaking, starting a game as soon as there are two.
+        """
+        player.game = None
+        player.queued_at = time.perf_counter()
+        waiting = self.__waiting[player.game_id]
+        waiting.append(player)
+
+        while len(waiting) >= 2:
+            first = waiting.popleft()
+            second = waiting.popleft()
+
+            if first.writer.is_closing():
+                waiting.appendleft(second)
+                continue
+
+            if second.writer.is_closing():
+                waiting.appendleft(first)
+                continue
+
+            self.stats.games_started += 1
+            self.stats.match_wait_total += time.perf_counter() - first.queued_at
+            GAME_TYPES[player.game_id](self, (first, second))
+
+    def game_finished(self, game: Game):
+        self.stats.games_finished += 1
+
+        for player in game.players:
+            if self.rematch and not player.writer.is_closing():
+                self.__enqueue(player)
+            else:
+                # The connection's handler waits for the transport to close
+                player.writer.close()
+
+    async def __handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Player:
+        uid, msg_type, context, payload_length = META_REQUEST.unpack(await reader.readexactly(META_REQUEST.size))
+        payload = await reader.readexactly(payload_length)
+
+        if msg_type != CONFIRMATION or payload_length != 2 or payload[1] not in GAME_TYPES:
+            writer.write(pack_response(CLIENT_INVALID_REQUEST, context))
+            await writer.drain()
+            return None
+
+        player = Player(next(self.__uids), payload[1], writer)
+        writer.write(pack_response(SUCCESS, context, UID_PAYLOAD.pack(player.uid)))
+        await writer.drain()
+
+        return player
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats.connections += 1
+        player = None
+
+        try:
+            player = await self.__handshake(reader, writer)
+
+            if player is None:
+                return
+
+            self.__enqueue(player)
+
+            while True:
+                uid, msg_type, context, payload_length = META_REQUEST.unpack(
+                    await reader.readexactly(META_REQUEST.size))
+                payload = await reader.readexactly(payload_length) if payload_length else b''
+
+                game = player.game
+                self.__handle_request(player, uid, msg_type, context, payload)
+
+                # The request may have sent updates to the opponent as well
+                await player.drain()
+
+                if game is not None:
+                    await game.opponent(player).drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+            if player is not None and player.game is not None:
+                player.game.forfeit(player)
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def __handle_request(self, player: Player, uid: int, msg_type: int, context: int, payload: bytes):
+        if uid != player.uid:
+            player.respond(CLIENT_INVALID_UID)
+        elif player.game is None or player.game.finished:
+            player.respond(ACTION_OUT_OF_TURN)
+        elif msg_type == META_ACTION and context == QUIT:
+            player.game.quit(player)
+        elif msg_type != GAME_ACTION:
+            player.respond(CLIENT_INVALID_TYPE)
+        elif len(payload) != 1:
+            player.respond(CLIENT_INVALID_PAYLOAD)
+        else:
+            player.game.play(player, payload[0])
+
+
+async def report_stats(server: ReferenceServer, interval: float):
+    """
+    Prints matchmaking and game rates every interval seconds.
+    """
+    stats = server.stats
+    last_started = 0
+    last_finished = 0
+
+    while True:
+        await asyncio.sleep(interval)
+
+        started = stats.games_started - last_started
+        finished = stats.games_finished - last_finished
+        last_started = stats.games_started
+        last_finished = stats.games_finished
+        mean_wait = stats.match_wait_total / stats.games_started if stats.games_started else 0.0
+
+        print("matched %.1f games/sec, finished %.1f games/sec, mean match wait %.3fms, %d connections"
+              % (started / interval, finished / interval, mean_wait * 1000, stats.connections))
+
+
+async def serve(host: str, port: int, rematch: bool, stats_interval: float):
+    server = ReferenceServer(rematch)
+    await server.start(host, port)
+
+    print("Listening on", host + ":" + str(server.get_port()))
+
+    if stats_interval:
+        asyncio.ensure_future(report_stats(server, stats_interval))
+
+    await server.serve_forever()
+
+
+def create_arguments() -> argparse:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on. Default = 127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="port to listen on. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--rematch", action="store_true",
+                        help="keep connections open after a game and queue the players again")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="print matchmaking rates every this many seconds. Default = off")
+
+    return parser
+
+
+def main():
+    args = create_arguments().parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.rematch, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Replays the client side of recorded sessions against a server.
+
+Reads a log written with --record (see replay_log.py) and opens one connection per recorded
+session. Each session re-sends its recorded requests, with the uid the server assigns in place
+of the recorded one, and waits for as many responses as the original client had received
+before each send, so turns stay in order. Sessions run concurrently on one event loop, but
+each one waits for the previous session's handshake before it connects, so a server that
+matches players first come, first served pairs them the way it paired the originals.
+
+By default every wait between frames is dropped and requests go out as soon as their
+responses allow. With --paced, sessions start and send at their recorded offsets instead.
+
+usage:
+    python3 replay.py [--port p] [--paced] [--concurrency c] [--timeout t] HOST LOG
+"""
+
+import argparse
+import asyncio
+import time
+from struct import Struct
+from async_client import close_writer, get_message, run_sessions
+from protocol import DEFAULT_PORT
+from replay_log import RECEIVED, SENT, read_log
+from constants import CONFIRMATION, ENDIANNESS, START_GAME, SUCCESS, UPDATE
+
+DEFAULT_TIMEOUT = 5.0
+
+# START_GAME identity code of the player the server matched first, X
+FIRST_PLAYER = 1
+
+# Requests are sent with the uid in front of the recorded frame; see codec.META_REQUEST
+UID_PREFIX = Struct("!L")
+
+
+class RecordedSession:
+    __slots__ = ('key', 'started', 'identity', 'game_started', 'records')
+
+    def __init__(self, key: tuple, started: int):
+        self.key = key
+        self.started = started
+        # START_GAME payload and when it arrived, if the session got that far
+        self.identity = None
+        self.game_started = None
+        self.records = []
+
+
+class ReplayedSession:
+    """
+    What happened when one session was replayed.
+
+    matched is False if any response's msg_type or context differed from the recording, which
+    happens when the server pairs the replayed sessions differently from the originals.
+    """
+    __slots__ = ('sent', 'received', 'matched', 'stalled', 'closed')
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.matched = True
+        self.stalled = False
+        self.closed = False
+
+
+def load_sessions(path: str) -> list:
+    """
+    Groups a log's frames by session.
+
+    :param path: str replay log
+    :return: list of RecordedSession in the order to replay them
+    """
+    sessions = {}
+
+    for record in read_log(path):
+        key = record.session_key()
+        session = sessions.get(key)
+
+        if session is None:
+            session = sessions[key] = RecordedSession(key, record.timestamp)
+
+        if (session.identity is None and record.kind == RECEIVED and record.msg_type == UPDATE
+                and record.context == START_GAME):
+            session.identity = record.payload[0]
+            session.game_started = record.timestamp
+
+        session.records.append(record)
+
+    return order_for_matchmaking(list(sessions.values()))
+
+
+def order_for_matchmaking(sessions: list) -> list:
+    """
+    Orders sessions so that a first come, first served server pairs them as it did originally.
+
+    The server makes the first of each pair X and the second O, and sends both their
+    START_GAME at the same moment. The n-th X to start a game is paired with the n-th O, and
+    each pair is placed where its X originally started. Timestamps from different processes
+    are only as close as their clocks, so games that started within microseconds of each
+    other may still be paired differently.
+
+    :param sessions: list of RecordedSession
+    :return: list of RecordedSession
+    """
+    by_game_start = sorted((session for session in sessions if session.identity is not None),
+                           key=lambda session: session.game_started)
+    firsts = [session for session in by_game_start if session.identity == FIRST_PLAYER]
+    seconds = [session for session in by_game_start if session.identity != FIRST_PLAYER]
+
+    # (start time of the pair, position in the pair) for each session
+    keys = {session.key: (session.started, 0) for session in sessions}
+
+    for first, second in zip(firsts, seconds):
+        keys[second.key] = (first.started, 1)
+
+    return sorted(sessions, key=lambda session: keys[session.key])
+
+
+async def replay_session(host: str, port: int, session: RecordedSession, paced_from: float = None,
+                         origin: int = 0, timeout: float = DEFAULT_TIMEOUT, after: asyncio.Event = None,
+                         handshaken: asyncio.Event = None) -> ReplayedSession:
+    """
+    Replays one recorded session.
+
+    :param host: str
+    :param port: int
+    :param session: RecordedSession
+    :param paced_from: float event loop time the replay started, or None to send without waiting
+    :param origin: int timestamp of the first recorded frame, for pacing
+    :param timeout: float seconds to wait for any one response before giving up on the session
+    :param after: asyncio.Event to wait for before connecting, if any
+    :param handshaken: asyncio.Event to set once the server has assigned a uid or the session is over
+    :return: ReplayedSession
+    """
+    loop = asyncio.get_running_loop()
+    replayed = ReplayedSession()
+
+    async def wait_until(timestamp: int):
+        if paced_from is not None:
+            delay = paced_from + (timestamp - origin) / 1000000 - loop.time()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    handshaken = handshaken or asyncio.Event()
+
+    try:
+        await wait_until(session.started)
+
+        if after is not None:
+            await after.wait()
+
+        reader, writer = await asyncio.open_connection(host, port)
+    except BaseException:
+        handshaken.set()
+        raise
+
+    expected = []
+    uid = 0
+    awaiting_uid = False
+
+    async def receive_expected():
+        nonlocal uid, awaiting_uid
+
+        while replayed.received < len(expected):
+            message = await asyncio.wait_for(get_message(reader), timeout)
+            recorded = expected[replayed.received]
+            replayed.received += 1
+
+            if message.msg_type != recorded.msg_type or message.context != recorded.context:
+                replayed.matched = False
+
+            if awaiting_uid:
+                awaiting_uid = False
+
+                if message.msg_type == SUCCESS:
+                    uid = int.from_bytes(message.payload, ENDIANNESS)
+
+                handshaken.set()
+
+    try:
+        for record in session.records:
+            if record.kind == RECEIVED:
+                expected.append(record)
+            elif record.kind == SENT:
+                await receive_expected()
+                await wait_until(record.timestamp)
+
+                writer.write(UID_PREFIX.pack(uid) + record.frame())
+                await writer.drain()
+                replayed.sent += 1
+                awaiting_uid = record.msg_type == CONFIRMATION
+
+        await receive_expected()
+    except asyncio.TimeoutError:
+        replayed.stalled = True
+        replayed.matched = False
+    except (asyncio.IncompleteReadError, ConnectionError):
+        replayed.closed = True
+        replayed.matched = False
+    finally:
+        handshaken.set()
+        await close_writer(writer)
+
+    return replayed
+
+
+async def replay(host: str, port: int, sessions: list, paced: bool = False, concurrency: int = None,
+                 timeout: float = DEFAULT_TIMEOUT) -> list:
+    """
+    Replays recorded sessions concurrently.
+
+    :param host: str
+    :param port: int
+    :param sessions: list of RecordedSession from load_sessions
+    :param paced: bool keep the recorded start times and gaps between frames
+    :param concurrency: int most sessions in flight at once, unbounded if None
+    :param timeout: float see replay_session
+    :return: list of ReplayedSession, or the exception a session raised, in session order
+    """
+    paced_from = asyncio.get_running_loop().time() if paced else None
+    origin = sessions[0].started if sessions else 0
+    handshakes = [asyncio.Event() for _ in sessions]
+
+    def factory(i: int):
+        return replay_session(host, port, sessions[i], paced_from, origin, timeout,
+                              handshakes[i - 1] if i else None, handshakes[i])
+
+    return await run_sessions(factory, len(sessions), concurrency)
+
+
+def print_report(sessions: list, results: list, elapsed: float):
+    replayed = [r for r in results if isinstance(r, ReplayedSession)]
+    sent = sum(r.sent for r in replayed)
+    received = sum(r.received for r in replayed)
+
+    recorded_span = 0.0
+
+    if sessions:
+        last = max(session.records[-1].timestamp for session in sessions)
+        recorded_span = (last - sessions[0].started) / 1000000
+
+    print("sessions: %d replayed, %d matched the recording, %d stalled, %d closed early, %d errors"
+          % (len(replayed), sum(1 for r in replayed if r.matched), sum(1 for r in replayed if r.stalled),
+             sum(1 for r in replayed if r.closed), len(results) - len(replayed)))
+    print("frames: %d sent, %d received" % (sent, received))
+    print("elapsed: %.3f s (recorded %.3f s), %.1f frames/sec"
+          % (elapsed, recorded_span, (sent + received) / elapsed if elapsed else 0.0))
+
+
+def create_arguments() -> argparse:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("host", help="server IP address")
+    parser.add_argument("log", help="replay log written with --record")
+    parser.add_argument("--port", help="server port #. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--paced", action="store_true", help="keep the recorded timing instead of going flat out")
+    parser.add_argument("--concurrency", type=int, help="most sessions in flight at once, even and at least 2 so paired sessions can both play. Default = all")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds to wait for a response before abandoning a session. Default = "
+                             + str(DEFAULT_TIMEOUT))
+
+    return parser
+
+
+def main():
+    parser = create_arguments()
+    args = parser.parse_args()
+
+    if args.concurrency is not None and (args.concurrency < 2 or args.concurrency % 2):
+        parser.error("--concurrency must be even and at least 2, or paired sessions can wait on each other forever")
+
+    try:
+        port = int(args.port)
+    except TypeError:
+        port = DEFAULT_PORT
+
+    sessions = load_sessions(args.log)
+
+    started = time.perf_counter()
+    results = asyncio.run(replay(args.host, port, sessions, args.paced, args.concurrency, args.timeout))
+    print_report(sessions, results, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
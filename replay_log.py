@@ -0,0 +1,169 @@
+"""
+Append-only binary log of the frames a client sends and receives, for replay.py.
+
+The file starts with MAGIC. After that it is a sequence of records, each a RECORD prefix of
+(kind, recorder, session, timestamp in microseconds since the epoch) followed by a frame:
+
+    SENT      the request frame without its uid
+    RECEIVED  the response frame
+
+Both kinds use the [msg_type, context, payload_length, payload...] layout get_header parses.
+Dropping the uid from requests keeps records small, and replay substitutes the uid the server
+assigns. Every process that opens the log picks a random recorder id and numbers its sessions
+(connections) from 0. Each record goes out in a single write to a file opened for appending,
+so several clients can record into the same log at once.
+
+Recording is off by default; the hooks in protocol.py only check whether recorder is set.
+"""
+
+import atexit
+import os
+import time
+import weakref
+from struct import Struct
+from codec import HEADER
+
+MAGIC = b"TTTL"
+RECORD = Struct("!BLLQ")
+
+SENT = 1
+RECEIVED = 2
+
+# Bytes a request has in front of its header; see codec.META_REQUEST
+UID_LENGTH = 4
+
+recorder = None
+
+
+class ReplayRecorder:
+    """
+    Writes frames to a replay log, one session per socket.
+    """
+
+    def __init__(self, path: str):
+        self.__file = open(path, "ab", buffering=0)
+        self.__recorder = int.from_bytes(os.urandom(4), "big")
+        self.__sessions = weakref.WeakKeyDictionary()
+        self.__next_session = 0
+
+        if self.__file.tell() == 0:
+            self.__file.write(MAGIC)
+
+        # Wall clock once, then perf_counter offsets so timestamps do not jump with clock adjustments
+        self.__epoch = time.time()
+        self.__origin = time.perf_counter()
+
+    def __timestamp(self) -> int:
+        return int((self.__epoch + time.perf_counter() - self.__origin) * 1000000)
+
+    def __session(self, s) -> int:
+        session = self.__sessions.get(s)
+
+        if session is None:
+            session = self.__sessions[s] = self.__next_session
+            self.__next_session += 1
+
+        return session
+
+    def record_sent(self, s, packet):
+        """
+        :param s: socket the packet was sent on
+        :param packet: bytes or memoryview of a whole request, uid included
+        :return: void
+        """
+        self.__file.write(RECORD.pack(SENT, self.__recorder, self.__session(s), self.__timestamp())
+                          + packet[UID_LENGTH:])
+
+    def record_received(self, s, msg_type: int, context: int, payload: bytes):
+        """
+        :param s: socket the frame was received on
+        :param msg_type: int
+        :param context: int
+        :param payload: bytes
+        :return: void
+        """
+        self.__file.write(RECORD.pack(RECEIVED, self.__recorder, self.__session(s), self.__timestamp())
+                          + HEADER.pack(msg_type, context, len(payload)) + payload)
+
+    def close(self):
+        self.__file.close()
+
+
+def start_recording(path: str):
+    """
+    Records every a4 / RPS frame sent or received from now on, closing the log on exit.
+
+    :param path: str log file, appended to if it exists
+    :return: void
+    """
+    global recorder
+
+    recorder = ReplayRecorder(path)
+    atexit.register(recorder.close)
+
+
+class LogRecord:
+    __slots__ = ('recorder', 'session', 'kind', 'timestamp', 'msg_type', 'context', 'payload')
+
+    def __init__(self, recorder: int, session: int, kind: int, timestamp: int, msg_type: int, context: int,
+                 payload: bytes):
+        self.recorder = recorder
+        self.session = session
+        self.kind = kind
+        self.timestamp = timestamp
+        self.msg_type = msg_type
+        self.context = context
+        self.payload = payload
+
+    def session_key(self) -> tuple:
+        return self.recorder, self.session
+
+    def frame(self) -> bytes:
+        """
+        :return: bytes the frame in its recorded layout
+        """
+        return HEADER.pack(self.msg_type, self.context, len(self.payload)) + self.payload
+
+
+def read_log(path: str):
+    """
+    Yields the frames in a replay log, in the order they were written, without loading the
+    whole file.
+
+    A record cut short at the end of the file, e.g. by a crash mid-write, ends the iteration.
+
+    :param path: str
+    :return: generator of LogRecord
+    """
+    with open(path, "rb") as log_file:
+        if log_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a replay log")
+
+        while True:
+            prefix = log_file.read(RECORD.size)
+
+            if len(prefix) < RECORD.size:
+                return
+
+            kind, recorder, session, timestamp = RECORD.unpack(prefix)
+            header = log_file.read(HEADER.size)
+
+            if len(header) < HEADER.size:
+                return
+
+            msg_type, context, payload_length = HEADER.unpack(header)
+            payload = log_file.read(payload_length)
+
+            if len(payload) < payload_length:
+                return
+
+            yield LogRecord(recorder, session, kind, timestamp, msg_type, context, payload)
+
+
+if __name__ == "__main__":
+    # Dumps a log as text: python3 replay_log.py FILE
+    import sys
+
+    for record in read_log(sys.argv[1]):
+        print("%08x" % record.recorder, record.session, "SENT" if record.kind == SENT else "RECEIVED", record.timestamp,
+              record.msg_type, record.context, list(record.payload))
@@ -0,0 +1,28 @@
+"""
+Structured result of one game, returned by the library API instead of exiting.
+"""
+
+
+class GameResult:
+    __slots__ = ('uid', 'identity', 'outcome', 'quit', 'dropped', 'reconnects', 'forfeited', 'moves', 'move_times',
+                 'connect_time', 'duration')
+
+    def __init__(self, uid: int = None):
+        self.uid = uid
+        self.identity = None
+        self.outcome = None         # OUTCOMES value, None if this player quit
+        self.quit = False
+        self.dropped = False        # the connection was lost mid-game; the game was forfeited
+        self.reconnects = 0         # connections lost or refused before this game could be played
+        self.forfeited = []         # dropped GameResults of the games lost on the way to this one
+        self.moves = []             # (identity, play) in the order they were made; identity is None for RPS
+        self.move_times = []        # seconds from sending each play to its response
+        self.connect_time = None    # seconds for connect + handshake, None on a reused connection
+        self.duration = None        # seconds from the start of the game to its end
+
+    def add_move(self, identity, play):
+        self.moves.append((identity, play))
+
+    def __repr__(self):
+        return "GameResult(uid=%s, outcome=%s, quit=%s, dropped=%s, moves=%s)" % (
+            self.uid, self.outcome, self.quit, self.dropped, self.moves)
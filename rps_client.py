@@ -1,103 +1,335 @@
-import argparse
-from struct import *
-from game_data import *
-from protocol import *
+import socket
+import sys
+import time
+from constants import (CODES, END_OF_GAME, EOF_MESSAGES, MESSAGES, MOVE_MADE, PAPER, ROCK, RPS, SCISSORS, SUCCESS,
+                       UPDATE)
+from game_data import GameData_a4, GameData_rps
+from protocol import DEFAULT_PORT, get_message, handshake, send_packet, set_read_timeout
+from codec import Message, pack_turn, request_type
+from dispatch import A4_CODES, UPDATE_CODE, GameState, Protocol, decode_a4, register
+from session import Backoff, SessionPool
+from errors import GameActionError, GameClientError, error_for_status
+from results import GameResult
+import instrumentation
+import replay_log
 
 MAX_VERSION = 4
-GAME_ID = 2
+GAME_ID = RPS
+
+
+def play_game(host: str, port: int, backoff: Backoff = None, strategy=None) -> GameResult:
+    f"""
+    Plays a game.
+
+    :param host: {str} server address
+    :param port: {int} server port
+    :param backoff: {Backoff} reconnect this way if the connection is lost or refused; a game in
+                    progress is forfeited and a new one is joined. None to fail instead
+    :param strategy: strategy to pick plays with and update after the game, e.g.
+                     rps_strategy.MarkovStrategy; None for human input
+    :return: {GameResult} of the game that was played to the end; the dropped results of any
+             games forfeited before it are in its forfeited list
+    :raises GameClientError: if the server reports an error
+    """
+    reconnects = 0
+    forfeited = []
+
+    while True:
+        result = GameResult()
 
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                started = time.perf_counter()
+                s.connect((host, port))
 
-def play_game(host: str, port: int):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((host, port))
+                result.uid = handshake(s, GAME_ID)
+                result.connect_time = time.perf_counter() - started
 
-        game_data = GameData_rps()
+                play_session(s, result.uid, result, strategy)
+        except OSError as e:
+            if backoff is None or not backoff.retry():
+                raise
 
-        game_data.set_uid(handshake(s, GAME_ID))
-        print("You have been assigned player ID", game_data.get_uid())
+            _report_reconnect(result, e)
+            reconnects += 1
 
-        message = get_message(s)
+            if result.dropped:
+                forfeited.append(result)
 
-        if message["header"]["msg_type"] == STATUS_CODES.UPDATE.value:
-            print("Welcome player")
+            continue
 
-        turn_ok = False
-        while not turn_ok:
-            turn_ok = take_turn(game_data, s)
+        result.reconnects = reconnects
+        result.forfeited = forfeited
 
-        print("Waiting for player to play")
-        server_message = get_message(s)
+        if backoff is not None:
+            backoff.reset()
 
-        msg_type = server_message["header"]["msg_type"]
-        msg_context = server_message["header"]["context"]
+        return result
 
-        if msg_type == STATUS_CODES.UPDATE.value and msg_context == UPD_CONTEXTS.MOVE_MADE.value:
-            pass
 
-        elif msg_type == STATUS_CODES.UPDATE.value and msg_context == UPD_CONTEXTS.END_OF_GAME.value:
-            adversarys_play = server_message["payload"][1]
+def play_games(host: str, port: int, games: int, reuse: bool = False, backoff: Backoff = None,
+               strategy=None) -> list:
+    f"""
+    Plays consecutive games through a connection pool.
 
-            if adversarys_play == RPS_PLAYS.ROCK.value:
-                adversarys_play = "Rock"
+    :param host: {str} server address
+    :param port: {int} server port
+    :param games: {int} number of games to play
+    :param reuse: {bool} the server keeps the connection open for the next game
+    :param backoff: {Backoff} see play_game; a forfeited game counts as one of the games
+    :param strategy: see play_game; it learns across the games of one connection and is reset
+                     with reset() whenever a game starts on another, as the opponent may differ
+    :return: {list} the GameResult of each game
+    """
+    results = []
+    reconnects = 0
+    previous = None
 
-            if adversarys_play == RPS_PLAYS.PAPER.value:
-                adversarys_play = "Paper"
+    with SessionPool(host, port, GAME_ID, reuse) as pool:
+        while len(results) < games:
+            result = GameResult()
 
-            if adversarys_play == RPS_PLAYS.SCISSORS.value:
-                adversarys_play = "Scissors"
+            try:
+                connection = pool.acquire()
+            except OSError as e:
+                if backoff is None or not backoff.retry():
+                    raise
 
-            outcome = server_message["payload"][0]
+                _report_reconnect(result, e)
+                reconnects += 1
+                continue
 
-            print("You", EOF_MESSAGES[outcome], " Opponent played", adversarys_play)
-            exit(0)
-        else:
-            print("Unexpected message received from server")
-            print(server_message)
+            result.uid = connection.uid
+            result.reconnects = reconnects
+            reusable = False
 
+            if strategy is not None and previous is not None and connection is not previous:
+                # A new connection may be paired with anyone, so the model of the last opponent is dropped
+                strategy.reset()
 
-def take_turn(game_data: GameData_a4, s: socket):
-    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+            previous = connection
+
+            try:
+                play_session(connection.socket, connection.uid, result, strategy)
+                reusable = not result.quit
+            except OSError as e:
+                if backoff is None or not backoff.retry():
+                    raise
+
+                _report_reconnect(result, e)
+                reconnects += 1
+
+                if not result.dropped:
+                    # Lost before a game started
+                    continue
+            finally:
+                pool.release(connection, reusable)
+
+            results.append(result)
+
+            if not result.dropped:
+                reconnects = 0
+
+                if backoff is not None:
+                    backoff.reset()
+
+            if result.quit:
+                break
 
-    if proposed_play == 'Q':
-        action = REQ_TYPES.META_ACTION.value
-        context = REQ_CONTEXTS.QUIT.value
-        payload_length = 0
+    return results
 
-        packet = pack("!LBBB", game_data.get_uid(), action, context, payload_length)
+
+def _report_reconnect(result: GameResult, error: OSError):
+    if result.identity is not None:
+        result.dropped = True
+        print("Connection lost during the game, which is forfeited:", error)
     else:
-        action = REQ_TYPES.GAME_ACTION.value
-        context = REQ_CONTEXTS.MAKE_MOVE.value
-        payload = int(proposed_play)
-        payload_length = 1
+        print("Could not join a game:", error)
+
+    print("Reconnecting...")
+
+
+def play_session(s: socket, uid: int, result: GameResult = None, strategy=None) -> GameResult:
+    f"""
+    Plays a game on a connection that has already done the handshake.
+
+    :param s: {socket} TCP socket
+    :param uid: {int} uid assigned by the handshake
+    :param result: {GameResult} to fill in, so the game's state survives a lost connection; a new one if None
+    :param strategy: see play_game
+    :return: {GameResult}
+    """
+    started = time.perf_counter()
+    game_data = GameData_rps()
+    game_data.set_strategy(strategy)
+
+    if result is None:
+        result = GameResult(uid)
+
+    game_data.set_uid(uid)
+    print("You have been assigned player ID", game_data.get_uid())
+
+    message = get_message(s)
+
+    if message.msg_type == UPDATE:
+        if message.payload:
+            # Which of the pair the server matched first; it marks the game as started
+            game_data.set_identity(message.payload[0])
+            result.identity = game_data.get_identity()
+
+        print("Welcome player")
+
+    state = GameState(s, game_data, result)
+
+    # The play stays owed while its prompt is cut short by a server message
+    state.owes_turn = True
+
+    while True:
+        if state.owes_turn:
+            turn_ok = False
+            while not turn_ok:
+                turn_ok = take_turn(game_data, s, result)
+
+                if turn_ok is None:
+                    break
+
+            state.owes_turn = turn_ok is None
+
+            if result.quit:
+                result.duration = time.perf_counter() - started
+                return result
+
+        if not state.owes_turn:
+            print("Waiting for player to play")
+
+        PROTOCOL.handle_next(state)
+
+        if state.over:
+            result.duration = time.perf_counter() - started
+            return result
+
+
+def _move_made(state: GameState, message: Message):
+    # The opponent's play is only revealed with the end of the game
+    pass
 
-        packet = pack("!LBBBB", game_data.get_uid(), action, context, payload_length, payload)
 
-    s.sendall(packet)
+def _end_of_game(state: GameState, message: Message):
+    adversarys_play = message.payload[1]
+    state.result.add_move(None, adversarys_play)
+    state.game_data.end_game(adversarys_play)
+
+    if adversarys_play == ROCK:
+        adversarys_play = "Rock"
+
+    if adversarys_play == PAPER:
+        adversarys_play = "Paper"
+
+    if adversarys_play == SCISSORS:
+        adversarys_play = "Scissors"
+
+    outcome = message.payload[0]
+
+    print("You", EOF_MESSAGES[outcome], " Opponent played", adversarys_play)
+    state.result.outcome = outcome
+    state.over = True
+
+
+def _unexpected(state: GameState, message: Message):
+    print("Unexpected message received from server")
+    print(message)
+
+
+PROTOCOL = register(GAME_ID, MAX_VERSION, Protocol(GameData_rps, decode_a4, A4_CODES, {
+    UPDATE_CODE + MOVE_MADE: _move_made,
+    UPDATE_CODE + END_OF_GAME: _end_of_game,
+}, fallback=_unexpected))
+
+
+def take_turn(game_data: GameData_a4, s: socket, result: GameResult = None):
+    f"""
+    Asks for a play, sends it and waits for the server's response.
+
+    :param game_data: {GameData_rps}
+    :param s: {socket}
+    :param result: {GameResult} to record the play in, if given
+    :return: {bool} True if the play was accepted, False if it was illegal and another is needed,
+             None if a server message arrived before a play was chosen
+    :raises StatusError: if the server rejects the request for anything other than an illegal play
+    """
+    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+
+    if proposed_play is None:
+        return None
+
+    sent_at = time.perf_counter()
+    send_packet(s, pack_turn(game_data.get_uid(), proposed_play))
 
     # Now get confirmation from Server
     play_response = get_message(s)
-    response_status = play_response["header"]["msg_type"]
+    response_status = play_response.msg_type
+    elapsed = time.perf_counter() - sent_at
 
-    if response_status == STATUS_CODES.SUCCESS.value:
-        if proposed_play == 'Q':
-            exit(0)
+    if result is not None:
+        result.move_times.append(elapsed)
+
+    if instrumentation.enabled:
+        instrumentation.record_response(request_type(proposed_play), response_status, elapsed)
+
+    if response_status == SUCCESS:
+        if result is not None:
+            if proposed_play == 'Q':
+                result.quit = True
+            else:
+                result.add_move(None, proposed_play)
 
         return True
-    else:  # TODO Handle errors
-        print(RESPONSE_MESSAGES[response_status])
-        return False
 
+    error = error_for_status(response_status)
+
+    if not isinstance(error, GameActionError):
+        raise error
+
+    print(error)
+    return False
+
+
+def create_arguments():
+    # Only the command line needs argparse, so library users and bots do not import it
+    import argparse
 
-def create_arguments() -> argparse:
     parser = argparse.ArgumentParser()
 
     parser.add_argument("host", help="server IP address")
     parser.add_argument("--port", help="server port #. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--metrics", nargs="?", const="-", metavar="FILE",
+                        help="record hot-path metrics and dump them as JSON on exit and on SIGUSR1 "
+                             "(to FILE, or stderr)")
+    parser.add_argument("--read-timeout", type=float, metavar="SECONDS",
+                        help="give up on a server message that has not fully arrived after this long. "
+                             "Default = wait indefinitely")
+    parser.add_argument("--reconnect", type=int, default=0, metavar="N",
+                        help="after losing the connection, reconnect up to N times in a row with jittered backoff, "
+                             "forfeiting any game in progress. Default = 0")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append every frame sent and received to a replay log")
+    parser.add_argument("--strategy", choices=("markov", "random"),
+                        help="let a strategy play instead of asking for input; markov learns the opponent's habits "
+                             "over consecutive games on one connection, so only with --reuse-connection, and "
+                             "starts over on every new connection")
+    parser.add_argument("--games", type=int, default=1, help="number of consecutive games to play. Default = 1")
+    parser.add_argument("--reuse-connection", action="store_true",
+                        help="play consecutive games on one connection, for servers that keep it open")
 
     return parser
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "loadgen":
+        import loadgen
+        loadgen.main(GAME_ID, sys.argv[0], sys.argv[2:])
+        return
+
     args = create_arguments().parse_args()
 
     try:
@@ -105,7 +337,30 @@ def main():
     except TypeError:
         port = DEFAULT_PORT
 
-    play_game(args.host, port)
+    if args.metrics:
+        instrumentation.dump_on_exit(None if args.metrics == "-" else args.metrics)
+
+    if args.record:
+        replay_log.start_recording(args.record)
+
+    if args.read_timeout:
+        set_read_timeout(args.read_timeout)
+
+    backoff = Backoff(args.reconnect) if args.reconnect else None
+
+    strategy = None
+    if args.strategy:
+        from rps_strategy import STRATEGIES
+        strategy = STRATEGIES[args.strategy]()
+
+    try:
+        if args.games > 1:
+            play_games(args.host, port, args.games, args.reuse_connection, backoff, strategy)
+        else:
+            play_game(args.host, port, backoff, strategy)
+    except GameClientError as e:
+        print(e)
+        exit(1)
 
 
 if __name__ == "__main__":
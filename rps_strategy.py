@@ -0,0 +1,129 @@
+"""
+Automated rock paper scissors strategies.
+
+A strategy picks plays with choose() and learns from each finished game with observe(), which
+rps_client calls with the END_OF_GAME payload. Keep one strategy per opponent: its model is
+of whoever it has been observing, so rps_client.play_games calls reset() whenever a game starts
+on a new connection, which the server may pair with anyone.
+
+MarkovStrategy predicts the opponent's next play from their last few plays and answers with
+the play that beats it. The model is a fixed table of decaying counts, one row per history of
+the opponent's last order plays, so memory does not grow with the number of games, and both
+choosing and observing touch a single row.
+"""
+
+import random
+from constants import PAPER, ROCK, SCISSORS
+
+PLAYS = (ROCK, PAPER, SCISSORS)
+
+# BEATS[play - 1] is the play that beats play
+BEATS = (PAPER, SCISSORS, ROCK)
+
+DEFAULT_ORDER = 2
+
+# Counts are scaled by this before each update, so an opponent who changes pattern is followed
+DEFAULT_DECAY = 0.9
+
+
+class RandomStrategy:
+    """
+    Uniformly random plays, as a baseline.
+    """
+
+    def choose(self) -> int:
+        return random.choice(PLAYS)
+
+    def observe(self, own_play: int, adversary_play: int):
+        pass
+
+    def reset(self):
+        pass
+
+
+class MarkovStrategy:
+    """
+    Order-n Markov model of the opponent's plays.
+    """
+
+    def __init__(self, order: int = DEFAULT_ORDER, decay: float = DEFAULT_DECAY):
+        """
+        :param order: int number of the opponent's previous plays a prediction is based on
+        :param decay: float weight kept by old observations at each update, 1 to never forget
+        """
+        if order < 0:
+            raise ValueError("order must not be negative")
+
+        self.__decay = decay
+        self.__histories = 3 ** order
+        # Row h holds the counts of ROCK, PAPER and SCISSORS after history h, base-3 of the last plays
+        self.__counts = [0.0] * (self.__histories * 3)
+        self.__history = 0
+
+    def reset(self):
+        """
+        Forgets everything observed, for a new opponent.
+
+        :return: void
+        """
+        self.__counts = [0.0] * (self.__histories * 3)
+        self.__history = 0
+
+    def get_counts(self) -> list:
+        return self.__counts
+
+    def predict(self) -> int:
+        """
+        :return: int the opponent's most likely next play, or None with no evidence to go on
+        """
+        row = self.__history * 3
+        counts = self.__counts
+        rock, paper, scissors = counts[row], counts[row + 1], counts[row + 2]
+
+        if rock == paper == scissors:
+            return None
+
+        if rock >= paper and rock >= scissors:
+            return ROCK
+
+        return PAPER if paper >= scissors else SCISSORS
+
+    def choose(self) -> int:
+        """
+        :return: int the play that beats the predicted one, random when there is no prediction
+        """
+        predicted = self.predict()
+
+        if predicted is None:
+            return random.choice(PLAYS)
+
+        return BEATS[predicted - 1]
+
+    def observe(self, own_play: int, adversary_play: int):
+        """
+        Learns from a finished game.
+
+        :param own_play: int RPS_PLAYS value this player made, unused by this model
+        :param adversary_play: int RPS_PLAYS value from the END_OF_GAME payload
+        :return: void
+        """
+        if adversary_play not in PLAYS:
+            # e.g. the opponent quit before playing
+            return
+
+        row = self.__history * 3
+        counts = self.__counts
+        decay = self.__decay
+
+        counts[row] *= decay
+        counts[row + 1] *= decay
+        counts[row + 2] *= decay
+        counts[row + adversary_play - 1] += 1.0
+
+        self.__history = (self.__history * 3 + adversary_play - 1) % self.__histories
+
+
+STRATEGIES = {
+    "markov": MarkovStrategy,
+    "random": RandomStrategy,
+}
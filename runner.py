@@ -0,0 +1,193 @@
+"""
+Multi-process game runner: shards bot games across a process pool to use every core.
+
+Each worker plays its shards on the asyncio engine, many sessions at a time, and sends back
+only a small summary (outcome counts and latency histograms) that the parent merges.
+
+usage:
+    python3 runner.py [--port p] [--game ttt|rps] [--games n] [--processes p] [--shard-games s]
+                      [--policy engine|random] [--timeout s] HOST
+
+A session that does not finish within the timeout, e.g. because its opponent never connected or
+dropped, is abandoned and counted as an error, so a soak test always ends with a report.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter
+from async_client import SessionTimings, play_rps, play_ttt, run_sessions
+from instrumentation import Histogram
+from loadgen import DEFAULT_SESSION_TIMEOUT, TTT_POLICIES, random_rps_move
+from protocol import DEFAULT_PORT
+from constants import RPS, TTT
+
+DEFAULT_GAMES = 1000
+DEFAULT_SHARD_GAMES = 100
+
+GAME_NAMES = {
+    "ttt": TTT,
+    "rps": RPS,
+}
+
+
+class ShardSummary:
+    __slots__ = ('outcomes', 'errors', 'timeouts', 'connect', 'move_rtt')
+
+    def __init__(self):
+        self.outcomes = Counter()
+        self.errors = 0             # sessions that raised, timeouts included
+        self.timeouts = 0
+        self.connect = Histogram()
+        self.move_rtt = Histogram()
+
+    def merge(self, other):
+        self.outcomes.update(other.outcomes)
+        self.errors += other.errors
+        self.timeouts += other.timeouts
+        self.connect.merge(other.connect)
+        self.move_rtt.merge(other.move_rtt)
+
+
+def run_shard(shard: tuple) -> ShardSummary:
+    """
+    Plays one shard in a worker process. Every shard holds an even number of sessions, so the
+    sessions in flight across all workers can always be paired up by the server.
+
+    :param shard: tuple of (host, port, game_id, games, policy name, session timeout in seconds or None)
+    :return: ShardSummary
+    """
+    host, port, game_id, games, policy, timeout = shard
+    timings = [SessionTimings() for _ in range(2 * games)]
+
+    if game_id == TTT:
+        choose_move = TTT_POLICIES[policy]
+
+        def play(i: int):
+            return play_ttt(host, port, choose_move, timings=timings[i])
+    else:
+        def play(i: int):
+            return play_rps(host, port, random_rps_move, timings=timings[i])
+
+    def session(i: int):
+        return asyncio.wait_for(play(i), timeout)
+
+    results = asyncio.run(run_sessions(session, 2 * games))
+
+    summary = ShardSummary()
+
+    for result in results:
+        if isinstance(result, BaseException):
+            summary.errors += 1
+            summary.timeouts += isinstance(result, asyncio.TimeoutError)
+            continue
+
+        # RPS sessions return (outcome, adversary's play)
+        outcome = result[0] if isinstance(result, tuple) else result
+        summary.outcomes[outcome] += 1
+
+    for session_timings in timings:
+        if session_timings.connect is not None:
+            summary.connect.record(session_timings.connect)
+
+        for move_time in session_timings.moves:
+            summary.move_rtt.record(move_time)
+
+    return summary
+
+
+def run_games(host: str, port: int, game_id: int, games: int, processes: int = None,
+              shard_games: int = DEFAULT_SHARD_GAMES, policy: str = "engine",
+              timeout: float = DEFAULT_SESSION_TIMEOUT) -> tuple:
+    """
+    Shards games across a process pool and merges the workers' summaries.
+
+    :param host: str
+    :param port: int
+    :param game_id: int GAMES value
+    :param games: int number of games; each one is two sessions
+    :param processes: int worker processes, one per core if None
+    :param shard_games: int games per shard
+    :param policy: str TTT_POLICIES key
+    :param timeout: float seconds each session may take before it is abandoned as an error, None for no limit
+    :return: tuple of (ShardSummary, elapsed seconds)
+    """
+    shards = []
+    remaining = games
+
+    while remaining > 0:
+        size = min(shard_games, remaining)
+        shards.append((host, port, game_id, size, policy, timeout))
+        remaining -= size
+
+    summary = ShardSummary()
+    started = time.perf_counter()
+
+    with multiprocessing.Pool(processes or os.cpu_count()) as pool:
+        for shard_summary in pool.imap_unordered(run_shard, shards):
+            summary.merge(shard_summary)
+
+    return summary, time.perf_counter() - started
+
+
+def print_summary(summary: ShardSummary, elapsed: float):
+    # Only the report needs the outcome names
+    from metadata import OUTCOMES
+
+    sessions = sum(summary.outcomes.values())
+
+    print("sessions: %d completed, %d errors, %d timed out" % (sessions, summary.errors, summary.timeouts))
+    print("elapsed: %.3f s, %.1f games/sec" % (elapsed, sessions / 2 / elapsed if elapsed else 0.0))
+    print("outcomes:", ", ".join("%s=%d" % (outcome.name, summary.outcomes[outcome.value]) for outcome in OUTCOMES))
+
+    for name in ("connect", "move_rtt"):
+        histogram = getattr(summary, name)
+        print(name + ":", " ".join("%s=%s" % (key, _format_ms(histogram.percentile(fraction)))
+                                   for key, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))))
+
+
+def _format_ms(seconds) -> str:
+    if seconds is None:
+        return "n/a"
+
+    return "<=%.3fms" % (seconds * 1000)
+
+
+def create_arguments() -> argparse:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("host", help="server IP address")
+    parser.add_argument("--port", help="server port #. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--game", choices=sorted(GAME_NAMES), default="ttt", help="game to play. Default = ttt")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES,
+                        help="number of games to play. Default = " + str(DEFAULT_GAMES))
+    parser.add_argument("--processes", type=int, help="worker processes. Default = one per core")
+    parser.add_argument("--shard-games", type=int, default=DEFAULT_SHARD_GAMES,
+                        help="games per shard, all played concurrently by one worker. Default = "
+                             + str(DEFAULT_SHARD_GAMES))
+    parser.add_argument("--policy", choices=sorted(TTT_POLICIES), default="engine",
+                        help="tic-tac-toe move policy. Default = engine")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_SESSION_TIMEOUT,
+                        help="seconds a session may take before it counts as an error. Default = "
+                             + str(DEFAULT_SESSION_TIMEOUT))
+
+    return parser
+
+
+def main():
+    args = create_arguments().parse_args()
+
+    try:
+        port = int(args.port)
+    except TypeError:
+        port = DEFAULT_PORT
+
+    summary, elapsed = run_games(args.host, port, GAME_NAMES[args.game], args.games, args.processes,
+                                 args.shard_games, args.policy, args.timeout)
+    print_summary(summary, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Connection pool for playing consecutive games.
+
+With reuse on, a connection that finished a game is kept, uid and all, and the next game is
+played on it. Otherwise each game gets a fresh connection and a replacement is connected in
+the background while the current game plays, so only the handshake is left on the critical
+path. Replacements are not handshaken in advance: the handshake puts the player in the
+server's matchmaking queue, and an idle pooled player could be paired with nobody to play it.
+
+Backoff paces reconnects after a connection is lost. The protocol has no way to resume a game
+on a new connection, so the lost game is forfeited and the player rejoins the queue.
+"""
+
+import socket
+import time
+from protocol import handshake
+
+# queue, random and threading are imported where they are used, so that a client playing a
+# single game does not load them at startup
+
+
+class PooledConnection:
+    __slots__ = ('socket', 'uid')
+
+    def __init__(self, s: socket, uid: int = None):
+        self.socket = s
+        self.uid = uid
+
+    def close(self):
+        self.socket.close()
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter.
+
+    The n-th retry in a row waits a random time between 0 and min(cap, base * 2^n). Clients that
+    lost the same server at the same moment therefore spread their reconnects out instead of
+    all hitting it together when it comes back.
+    """
+
+    def __init__(self, retries: int, base: float = 0.1, cap: float = 10.0):
+        """
+        :param retries: int most retries in a row before giving up
+        :param base: float seconds, upper bound of the first delay
+        :param cap: float seconds, largest upper bound
+        """
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.__attempt = 0
+
+    def delay(self) -> float:
+        import random
+
+        return random.uniform(0, min(self.cap, self.base * (1 << self.__attempt)))
+
+    def retry(self) -> bool:
+        """
+        Waits before the next attempt.
+
+        :return: bool False if the retries are used up
+        """
+        if self.__attempt >= self.retries:
+            return False
+
+        time.sleep(self.delay())
+        self.__attempt += 1
+
+        return True
+
+    def reset(self):
+        """
+        Starts over after a success.
+
+        :return: void
+        """
+        self.__attempt = 0
+
+
+class SessionPool:
+
+    def __init__(self, host: str, port: int, game_id: int, reuse: bool = False):
+        """
+        :param host: str
+        :param port: int
+        :param game_id: int GAMES value
+        :param reuse: bool the server keeps a connection open for the next game after END_OF_GAME
+        """
+        import queue
+
+        self.__address = (host, port)
+        self.__game_id = game_id
+        self.__reuse = reuse
+        self.__ready = queue.Queue()
+        self.__closed = False
+
+        self.__warm()
+
+    def __warm(self):
+        """
+        Connects a replacement in the background.
+
+        :return: void
+        """
+        import threading
+
+        threading.Thread(target=self.__connect, daemon=True).start()
+
+    def __connect(self):
+        try:
+            connection = PooledConnection(socket.create_connection(self.__address))
+        except OSError as e:
+            self.__ready.put(e)
+            return
+
+        if self.__closed:
+            connection.close()
+        else:
+            self.__ready.put(connection)
+
+    def acquire(self) -> PooledConnection:
+        """
+        Gets a connected, handshaken connection for the next game.
+
+        :return: PooledConnection
+        """
+        connection = self.__ready.get()
+
+        if isinstance(connection, Exception):
+            self.__warm()
+            raise connection
+
+        if connection.uid is None:
+            try:
+                connection.uid = handshake(connection.socket, self.__game_id)
+            except Exception:
+                connection.close()
+                self.__warm()
+                raise
+
+        if not self.__reuse:
+            self.__warm()
+
+        return connection
+
+    def release(self, connection: PooledConnection, reusable: bool = True):
+        """
+        Hands a connection back after its game.
+
+        :param connection: PooledConnection
+        :param reusable: bool False if the game ended abnormally and the connection must be dropped
+        :return: void
+        """
+        if self.__reuse and reusable and not self.__closed:
+            self.__ready.put(connection)
+            return
+
+        connection.close()
+
+        if self.__reuse and not self.__closed:
+            self.__warm()
+
+    def close(self):
+        """
+        Closes every idle connection.
+
+        :return: void
+        """
+        import queue
+
+        self.__closed = True
+
+        while True:
+            try:
+                connection = self.__ready.get_nowait()
+            except queue.Empty:
+                return
+
+            if isinstance(connection, PooledConnection):
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -5,10 +5,20 @@ Copyright: Clinton Fernandes, February 2021
 e-mail: clintonf@gmail.com
 """
 
-import argparse
-from struct import *
-from game_data import *
-from protocol import *
+import socket
+import sys
+import time
+from constants import CODES, END_OF_GAME, EOF_MESSAGES, ID_X, MESSAGES, MOVE_MADE, SUCCESS, TTT, UPDATE, WIN
+from game_data import GameData, GameData_a4, set_opening_book, set_quiet
+from protocol import DEFAULT_PORT, get_message, handshake, send_packet, set_read_timeout
+from codec import Message, pack_turn, request_type
+from dispatch import (A4_CODES, UPDATE_CODE, GameState, Protocol, decode_a4, get_protocol, get_versions, register,
+                      register_module)
+from session import Backoff, SessionPool
+from errors import GameActionError, GameClientError, error_for_status
+from results import GameResult
+import instrumentation
+import replay_log
 
 hosts = {
     'emerald': '24.85.240.252',
@@ -18,18 +28,17 @@ hosts = {
 }
 
 MAX_VERSION = 4
-GAME_ID = 1
+GAME_ID = TTT
 
 
-def print_message(message: dict):
+def print_message(message: Message):
     f"""
     Prints out a packet representation for debug purposes.
     
-    :param message: {dict} representation of the data packet 
+    :param message: {Message} the data packet
     :return: {None}
     """
-    print(message["header"])
-    print(message["payload"])
+    print(message)
 
 
 def get_game_object(protocol_version: int) -> GameData:
@@ -39,176 +48,335 @@ def get_game_object(protocol_version: int) -> GameData:
     :param protocol_version: {int} protocol version of game
     :return: {GameData}
     """
-    if protocol_version == 1:
-        return GameData()
-    if protocol_version == 2:
-        return GameData_v2()
-    if protocol_version == 4:
-        return GameData_a4()
-
-    print("Invalid protocol specified")
-    exit(1)
+    return get_protocol(GAME_ID, protocol_version).new_game()
 
 
-def play_game(host: str, port: int, protocol_version: int = 1):
+def play_game(host: str, port: int, protocol_version: int = 1, engine=None, backoff: Backoff = None):
     if protocol_version == 4:
-        play_game_a4(host, port)
+        return play_game_a4(host, port, engine, backoff)
     else:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((host, port))
 
-            proposed_play = None
-            game_data = get_game_object(protocol_version)
+            protocol = get_protocol(GAME_ID, protocol_version)
+            state = GameState(s, protocol.new_game())
+
+            while not state.over:
+                protocol.handle_next(state)
+
+
+def play_game_a4(host: str, port: int, engine=None, backoff: Backoff = None):
+    f"""
+    Plays a version 4 game.
+
+    :param host: {str} server address
+    :param port: {int} server port
+    :param engine: engine to pick moves with, None for human input
+    :param backoff: {Backoff} reconnect this way if the connection is lost or refused; a game in
+                    progress is forfeited and a new one is joined. None to fail instead
+    :return: {GameResult} of the game that was played to the end; the dropped results of any
+             games forfeited before it are in its forfeited list
+    :raises GameClientError: if the server reports an error
+    """
+    reconnects = 0
+    forfeited = []
+
+    while True:
+        result = GameResult()
+
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                started = time.perf_counter()
+                s.connect((host, port))
+
+                result.uid = handshake(s, GAME_ID)
+                result.connect_time = time.perf_counter() - started
+
+                play_session_a4(s, result.uid, engine, result)
+        except OSError as e:
+            if backoff is None or not backoff.retry():
+                raise
+
+            _report_reconnect(result, e)
+            reconnects += 1
+
+            if result.dropped:
+                forfeited.append(result)
+
+            continue
+
+        result.reconnects = reconnects
+        result.forfeited = forfeited
+
+        if backoff is not None:
+            backoff.reset()
+
+        return result
+
+
+def play_games_a4(host: str, port: int, games: int, engine=None, reuse: bool = False,
+                  backoff: Backoff = None) -> list:
+    f"""
+    Plays consecutive version 4 games through a connection pool.
+
+    :param host: {str} server address
+    :param port: {int} server port
+    :param games: {int} number of games to play
+    :param engine: engine to pick moves with, None for human input
+    :param reuse: {bool} the server keeps the connection open for the next game
+    :param backoff: {Backoff} see play_game_a4; a forfeited game counts as one of the games
+    :return: {list} the GameResult of each game
+    """
+    results = []
+    reconnects = 0
+
+    with SessionPool(host, port, GAME_ID, reuse) as pool:
+        while len(results) < games:
+            result = GameResult()
+
+            try:
+                connection = pool.acquire()
+            except OSError as e:
+                if backoff is None or not backoff.retry():
+                    raise
+
+                _report_reconnect(result, e)
+                reconnects += 1
+                continue
 
-            while True:
-                server_message = s.recv(game_data.get_bytes_to_expect())
-                message = int.from_bytes(server_message, 'big')
+            result.uid = connection.uid
+            result.reconnects = reconnects
+            reusable = False
 
-                if message == CODES["VERSION"]:
-                    pass
+            try:
+                play_session_a4(connection.socket, connection.uid, engine, result)
+                reusable = not result.quit
+            except OSError as e:
+                if backoff is None or not backoff.retry():
+                    raise
 
-                if message == CODES["WELCOME"]:
-                    game_data.process_welcome(s, MESSAGES[CODES["WELCOME"]])
-                    print(game_data)
+                _report_reconnect(result, e)
+                reconnects += 1
 
-                    if game_data.get_identity() == IDENTITIES["X"]:
-                        proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+                if not result.dropped:
+                    # Lost before a game started
+                    continue
+            finally:
+                pool.release(connection, reusable)
 
-                if message == CODES["INVITE"]:
-                    game_data.set_game_board(s)
-                    game_data.print_board()
+            results.append(result)
 
-                    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+            if not result.dropped:
+                reconnects = 0
 
-                if message == CODES["INVALID"]:
-                    print(MESSAGES[CODES["INVALID"]])
-                    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+                if backoff is not None:
+                    backoff.reset()
 
-                if message == CODES["ACCEPTED"]:
-                    print(MESSAGES[CODES["ACCEPTED"]])
-                    try:
-                        game_data.set_play(proposed_play)
-                    except IndexError:
-                        # I have not idea what's happening
-                        pass
+            if result.quit:
+                break
 
-                    proposed_play = None
+    return results
 
-                    game_data.print_board()
 
-                if message == CODES["WIN"]:
-                    print(MESSAGES[CODES["WIN"]])
+def _report_reconnect(result: GameResult, error: OSError):
+    if result.identity is not None:
+        result.dropped = True
+        print("Connection lost during the game, which is forfeited:", error)
+    else:
+        print("Could not join a game:", error)
+
+    print("Reconnecting...")
 
-                if message == CODES["LOSE"]:
-                    print(MESSAGES[CODES["LOSE"]])
 
-                if message == CODES["TIE"]:
-                    print(MESSAGES[CODES["TIE"]])
+def play_session_a4(s: socket, uid: int, engine=None, result: GameResult = None) -> int:
+    f"""
+    Plays a version 4 game on a connection that has already done the handshake.
+
+    :param s: {socket} TCP socket
+    :param uid: {int} uid assigned by the handshake
+    :param engine: engine to pick moves with, None for human input
+    :param result: {GameResult} to fill in, so the game's state survives a lost connection; a new one if None
+    :return: {GameResult}
+    """
+    started = time.perf_counter()
+    game_data = GameData_a4()
+    game_data.set_engine(engine)
+    game_data.set_uid(uid)
 
-                if message == CODES["DISCONNECT"]:
-                    print(MESSAGES[CODES["DISCONNECT"]])
+    if result is None:
+        result = GameResult(uid)
 
+    print("You have been assigned player ID", game_data.get_uid())
 
-def play_game_a4(host: str, port: int):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((host, port))
+    # Set identity_code
+    message = get_message(s)
 
-        game_data = GameData_a4()
+    if message.msg_type == UPDATE:
+        game_data.set_identity(message.payload[0])
 
-        game_data.set_uid(handshake(s, GAME_ID))
-        print("You have been assigned player ID", game_data.get_uid())
+    result.identity = game_data.get_identity()
+    print("Welcome player", chr(game_data.get_identity()))
 
-        # Set identity_code
-        message = get_message(s)
+    state = GameState(s, game_data, result)
 
-        if message["header"]["msg_type"] == STATUS_CODES.UPDATE.value:
-            game_data.set_identity(message["payload"][0])
+    # A turn stays owed while the prompt for it is cut short by a server message
+    state.owes_turn = game_data.get_identity() == ID_X
 
-        print("Welcome player", chr(game_data.get_identity()))
+    while True:
+        if state.owes_turn:
+            state.owes_turn = not _play_turn(game_data, s, result)
 
-        if game_data.get_identity() == IDs.X.value:
-            turn_ok = False
-            while not turn_ok:
-                turn_ok = take_turn(game_data, s)
+            if result.quit:
+                return _finish(result, started)
 
-        # So, now we wait for an update message.
-        while True:
+        if not state.owes_turn:
             print("Waiting for player to play")
-            server_message = get_message(s)
 
-            msg_type = server_message["header"]["msg_type"]
-            msg_context = server_message["header"]["context"]
+        A4_PROTOCOL.handle_next(state)
 
-            if msg_type == STATUS_CODES.UPDATE.value and msg_context == UPD_CONTEXTS.MOVE_MADE.value:
-                adversarys_play = server_message["payload"][0]
-                game_data.update_board(adversarys_play, game_data.get_adversary())
-                game_data.print_board()
+        if state.over or result.quit:
+            return _finish(result, started)
 
-                turn_ok = False
-                while not turn_ok:
-                    turn_ok = take_turn(game_data, s)
-            elif msg_type == STATUS_CODES.UPDATE.value and msg_context == UPD_CONTEXTS.END_OF_GAME.value:
-                outcome = server_message["payload"][0]
 
-                if outcome != OUTCOMES.WIN.value:
-                    game_data.update_board(server_message["payload"][1], game_data.get_adversary())
-                    game_data.print_board()
+def _move_made(state: GameState, message: Message):
+    game_data = state.game_data
+    adversarys_play = message.payload[0]
+    game_data.update_board(adversarys_play, game_data.get_adversary())
+    state.result.add_move(game_data.get_adversary(), adversarys_play)
+    game_data.print_board()
 
-                print("You", EOF_MESSAGES[outcome])
-                exit(0)
-            else:
-                print("Unexpected message received from server")
-                print(server_message)
+    state.owes_turn = True
 
 
-def take_turn(game_data: GameData_a4, s: socket):
-    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+def _end_of_game(state: GameState, message: Message):
+    game_data = state.game_data
+    outcome = message.payload[0]
 
-    if proposed_play == 'Q':
-        action = REQ_TYPES.META_ACTION.value
-        context = REQ_CONTEXTS.QUIT.value
-        payload_length = 0
+    # On a tie the last play may have been this player's own
+    if outcome != WIN and game_data.check_if_spot_is_played(message.payload[1]):
+        game_data.update_board(message.payload[1], game_data.get_adversary())
+        state.result.add_move(game_data.get_adversary(), message.payload[1])
+        game_data.print_board()
+
+    print("You", EOF_MESSAGES[outcome])
+    state.result.outcome = outcome
+    state.over = True
+
+
+def _unexpected(state: GameState, message: Message):
+    print("Unexpected message received from server")
+    print(message)
+
+
+def _play_turn(game_data: GameData_a4, s: socket, result: GameResult = None) -> bool:
+    f"""
+    Takes turns until a play is accepted.
+
+    :return: {bool} False if a server message arrived while the player was choosing
+    """
+    turn_ok = False
+
+    while not turn_ok:
+        turn_ok = take_turn(game_data, s, result)
+
+        if turn_ok is None:
+            return False
+
+    return True
 
-        packet = pack("!LBBB", game_data.get_uid(), action, context, payload_length)
-    else:
-        action = REQ_TYPES.GAME_ACTION.value
-        context = REQ_CONTEXTS.MAKE_MOVE.value
-        payload = int(proposed_play)
-        payload_length = 1
 
-        packet = pack("!LBBBB", game_data.get_uid(), action, context, payload_length, payload)
+def _finish(result: GameResult, started: float) -> GameResult:
+    result.duration = time.perf_counter() - started
 
-    s.sendall(packet)
+    return result
+
+
+def take_turn(game_data: GameData_a4, s: socket, result: GameResult = None):
+    f"""
+    Asks for a play and sends it to the server.
+
+    :param game_data: {GameData_a4}
+    :param s: {socket}
+    :param result: {GameResult} to record the play in, if given
+    :return: {bool} True if the play was accepted, False if it was illegal,
+             None if a server message arrived before a play was chosen
+    :raises StatusError: if the server rejects the request for anything other than an illegal play
+    """
+    proposed_play = game_data.make_play(s, MESSAGES[CODES["INVITE"]])
+
+    if proposed_play is None:
+        return None
+
+    sent_at = time.perf_counter()
+    send_packet(s, pack_turn(game_data.get_uid(), proposed_play))
 
     # Now get confirmation from Server
     play_response = get_message(s)
-    response_status = play_response["header"]["msg_type"]
+    elapsed = time.perf_counter() - sent_at
+
+    if result is not None:
+        result.move_times.append(elapsed)
+
+    if instrumentation.enabled:
+        instrumentation.record_response(request_type(proposed_play), play_response.msg_type, elapsed)
+
+    return process_response(game_data, proposed_play, play_response.msg_type, result)
+
+
+def process_response(game_data: GameData_a4, proposed_play: str, response_status: int,
+                     result: GameResult = None) -> bool:
+    f"""
+    Applies the server's response to a play.
+
+    :param game_data: {GameData_a4}
+    :param proposed_play: {str} the play the response answers
+    :param response_status: {int} STATUS_CODES value of the response
+    :param result: {GameResult} to record the play in, if given
+    :return: {bool} True if the play was accepted, False if it was illegal and another is needed
+    :raises StatusError: for any other error status
+    """
+    if response_status == SUCCESS:
+        if proposed_play == 'Q':
+            if result is not None:
+                result.quit = True
+
+            return True
 
-    if response_status == STATUS_CODES.SUCCESS.value:
         game_data.update_board(proposed_play, game_data.get_identity())
         game_data.print_board()
 
-        if proposed_play == 'Q':
-            exit(0)
+        if result is not None:
+            result.add_move(game_data.get_identity(), int(proposed_play))
 
         return True
-    else:  # TODO Handle errors
-        print(RESPONSE_MESSAGES[response_status])
-        return False
 
+    error = error_for_status(response_status)
 
-def get_version_options() -> str:
-    string = "["
+    if not isinstance(error, GameActionError):
+        raise error
+
+    print(error)
+    return False
 
-    for i in range(1, MAX_VERSION):
-        string = string + str(i) + " | "
 
-    string = string + str(MAX_VERSION) + "]"
+# Versions 1 and 2 are only loaded when played
+register_module(GAME_ID, 1, "legacy")
+register_module(GAME_ID, 2, "legacy")
 
-    return string
+A4_PROTOCOL = register(GAME_ID, 4, Protocol(GameData_a4, decode_a4, A4_CODES, {
+    UPDATE_CODE + MOVE_MADE: _move_made,
+    UPDATE_CODE + END_OF_GAME: _end_of_game,
+}, fallback=_unexpected))
 
 
-def create_arguments() -> argparse:
+def get_version_options() -> str:
+    return "[" + " | ".join(str(version) for version in get_versions(GAME_ID)) + "]"
+
+
+def create_arguments():
+    # Only the command line needs argparse, so library users and bots do not import it
+    import argparse
+
     parser = argparse.ArgumentParser()
 
     protocol_help = "protocol version " + get_version_options() + ", default = 1, there is no version 3"
@@ -216,18 +384,44 @@ def create_arguments() -> argparse:
     parser.add_argument("host", help="server IP address")
     parser.add_argument("--version", help=protocol_help, type=int)
     parser.add_argument("--port", help="server port #. Default = " + str(DEFAULT_PORT))
+    parser.add_argument("--metrics", nargs="?", const="-", metavar="FILE",
+                        help="record hot-path metrics and dump them as JSON on exit and on SIGUSR1 "
+                             "(to FILE, or stderr)")
+    parser.add_argument("--read-timeout", type=float, metavar="SECONDS",
+                        help="give up on a server message that has not fully arrived after this long. "
+                             "Default = wait indefinitely")
+    parser.add_argument("--reconnect", type=int, default=0, metavar="N",
+                        help="after losing the connection, reconnect up to N times in a row with jittered backoff, "
+                             "forfeiting any game in progress (version 4 only). Default = 0")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append every frame sent and received to a replay log (version 4 only)")
+    parser.add_argument("--engine", action="store_true", help="let the built-in engine play (version 4 only)")
+    parser.add_argument("--engine-table", metavar="PATH",
+                        help="let the engine play from a solved table file, written first if missing. Implies --engine")
+    parser.add_argument("--opening-book", metavar="PATH",
+                        help="play book positions from an opening book file, written first if missing. Implies --engine")
+    parser.add_argument("--quiet", action="store_true", help="do not draw the board, e.g. for unattended engine games")
+    parser.add_argument("--games", type=int, default=1,
+                        help="number of consecutive games to play (version 4 only). Default = 1")
+    parser.add_argument("--reuse-connection", action="store_true",
+                        help="play consecutive games on one connection, for servers that keep it open")
 
     return parser
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "loadgen":
+        import loadgen
+        loadgen.main(GAME_ID, sys.argv[0], sys.argv[2:])
+        return
+
     args = create_arguments().parse_args()
     try:
         version = int(args.version)
     except TypeError:
         version = 1
 
-    if version not in (1, 2, 4):
+    if version not in get_versions(GAME_ID):
         print("Invalid version")
         exit(1)
 
@@ -236,7 +430,40 @@ def main():
     except TypeError:
         port = DEFAULT_PORT
 
-    play_game(args.host, port, version)
+    if args.metrics:
+        instrumentation.dump_on_exit(None if args.metrics == "-" else args.metrics)
+
+    if args.record:
+        replay_log.start_recording(args.record)
+
+    if args.read_timeout:
+        set_read_timeout(args.read_timeout)
+
+    if args.quiet:
+        set_quiet(True)
+
+    if args.opening_book:
+        from opening_book import open_book
+        set_opening_book(open_book(args.opening_book))
+
+    engine = None
+    if args.engine_table:
+        from engine_table import open_table
+        engine = open_table(args.engine_table)
+    elif args.engine or args.opening_book:
+        from engine import get_engine
+        engine = get_engine()
+
+    backoff = Backoff(args.reconnect) if args.reconnect else None
+
+    try:
+        if version == 4 and args.games > 1:
+            play_games_a4(args.host, port, args.games, engine, args.reuse_connection, backoff)
+        else:
+            play_game(args.host, port, version, engine, backoff)
+    except GameClientError as e:
+        print(e)
+        exit(1)
 
 
 if __name__ == "__main__":